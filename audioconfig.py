@@ -0,0 +1,114 @@
+"""
+File: audioconfig.py
+
+Description: Audio engine settings (sample rate, buffer size, channel count, output device) and the buffer auto-tuner.
+
+The settings are read from audio.json, beside profile.json, when back_init() opens the mixer, for example:
+    {"frequency": 48000, "buffer": 256, "channels": 2, "device": null}
+"device" is an SDL output device name (null is the system default). "buffer" is the mixer buffer size in samples, which
+sets the output latency (512 samples at 44.1 kHz is about 12 ms). It can also be "auto": the smallest buffer that plays
+without underruns on this hardware is then measured once and remembered in audio.json under "tuned", so later starts
+skip the measurement until the rate, channels or device change.
+
+The mixer may run at the device's native rate instead of the one asked for (SDL is allowed to change it), which avoids
+a resampling stage in the audio callback. Decoded sounds are always converted to the mixer's actual format when they
+are loaded into the sound bank, so nothing is converted per play; the bank only has to be rebuilt when the format
+changes (see backend.audio_init()).
+"""
+import json
+import os
+import time
+import pygame
+import pygame.mixer as mixer
+from persist import atomic_write
+
+config_file = "audio.json"
+defaults = {"frequency": 44100, "buffer": 512, "channels": 2, "device": None}
+tune_buffers = (128, 256, 512, 1024, 2048)  # Buffer sizes tried by auto_tune(), smallest first
+tune_length = 0.5           # Seconds of silence played per auto-tune trial
+tune_trials = 3
+config: dict = dict(defaults)
+
+
+def audio_load(profile_file: str = "profile.json"):
+    """Reads the settings stored beside profile_file. Missing or invalid values fall back to the defaults."""
+    global config_file, config
+
+    config_file = os.path.join(os.path.dirname(profile_file), "audio.json")
+    try:
+        with open(config_file, "r") as fp:
+            loaded = json.load(fp)
+    except (OSError, ValueError):
+        loaded = {}
+
+    config = dict(defaults)
+    config.update((k, v) for k, v in loaded.items() if k in defaults or k == "tuned")
+    if not isinstance(config["frequency"], int) or config["frequency"] <= 0:
+        config["frequency"] = defaults["frequency"]
+    if config["buffer"] != "auto" and (not isinstance(config["buffer"], int) or config["buffer"] <= 0):
+        config["buffer"] = defaults["buffer"]
+    if config["channels"] not in (1, 2):
+        config["channels"] = defaults["channels"]
+    return config
+
+
+def audio_save():
+    atomic_write(config_file, json.dumps(config, indent=1))
+
+
+def mixer_open(buffer: int = None):
+    """(Re)opens the mixer with the configured settings, or with buffer instead of the configured buffer size."""
+    if buffer is None:
+        buffer = tuned_buffer()
+    if mixer.get_init():
+        mixer.quit()
+    mixer.pre_init(frequency=config["frequency"], size=-16, channels=config["channels"], buffer=buffer,
+                   devicename=config["device"])
+    mixer.init()
+
+
+def tune_key():
+    return {"frequency": config["frequency"], "channels": config["channels"], "device": config["device"]}
+
+
+def tuned_buffer():
+    """Returns the buffer size to open the mixer with: the configured one, or the auto-tuned one if it is "auto" (tuning
+    first if this hardware setup has not been measured yet)."""
+    if config["buffer"] != "auto":
+        return config["buffer"]
+    tuned = config.get("tuned")
+    if tuned is None or any(tuned.get(k) != v for k, v in tune_key().items()):
+        config["tuned"] = dict(tune_key(), buffer=auto_tune())
+        audio_save()
+    return config["tuned"]["buffer"]
+
+
+def underruns(buffer: int):
+    """Plays tune_trials stretches of silence with the mixer opened at buffer and returns how many finished late. A
+    sound that keeps playing past its length plus the buffer's own latency was starved by late audio callbacks."""
+    mixer_open(buffer)
+    freq, size, channels = mixer.get_init()
+    silence = mixer.Sound(buffer=bytes(round(tune_length * freq) * channels * (abs(size) // 8)))
+    allowed = tune_length + 3 * buffer / freq + 0.01        # Output queue plus polling slack
+    late = 0
+    for i in range(tune_trials):
+        channel = silence.play()
+        begin = time.perf_counter()
+        while channel.get_busy():
+            if time.perf_counter() - begin > allowed:
+                late += 1
+                channel.stop()
+                break
+            time.sleep(0.001)
+    return late
+
+
+def auto_tune():
+    """Returns the smallest buffer size in tune_buffers that plays without underruns (the largest if none does)."""
+    for buffer in tune_buffers:
+        try:
+            if underruns(buffer) == 0:
+                return buffer
+        except pygame.error:        # Buffer size not supported by the device
+            continue
+    return tune_buffers[-1]
@@ -10,19 +10,47 @@ ugly interface (the command prompt). It is possible to run all basic functions o
 file and controlling through the command prompt, given that the global variable run_in_cmd remains True (other file's
 functions, such as the GUI, that call on file must set run_in_cmd to False in order to not get stuck in the command
 prompt inputs and loops that were built with said command prompt inputs in mind).
+
+Only pygame.mixer is ever initialized (not all of pygame), with the settings from audio.json (see audioconfig.py). With
+fast_start on (the GUI), back_init() only loads the profile and opens the mixer, starts the engine and preloads the
+sound bank on a background thread, so the grid can be shown while the audio device is still opening. Every startup
+phase is timed, see startup_report(). With metrics enabled (PISOUND_METRICS=1, see metrics.py) the hot paths are timed
+too and reported every metrics_interval seconds, to the console and to metrics_file.
 """
-import json
+import time
+startup_begin = time.perf_counter()
 import pygame
 import threading
 import os
-import time
-from pygame import mixer_music as mix
+import glob
+import shutil
+import filecmp
+import atexit
+from contextlib import contextmanager
+from dataclasses import replace
 import pygame.mixer as mixer
+import scheduler
+from persist import atomic_write, count_request, journal_append, journal_read, journal_reset, snapshot_hash, \
+    write_later, write_stats
+from soundbank import bank_get_trimmed, bank_drop, bank_clear, bank_load, bank_pin, bank_prefetch, bank_stats, \
+    bank_set_budget, trim_key
+from engine import Voice, engine_init, engine_meters, engine_play, engine_stop_all, engine_wait
+from metaindex import meta_duration, meta_flush, meta_get, meta_load
+from library import library_list, library_ready, library_start
+from audioconfig import audio_load, mixer_open
+from pcmcache import cache_build, cache_stats
+from loudness import loudness_gain, loudness_queue
+from soundentry import SoundEntry, entry_check, entry_clips, entry_from_dict, entry_to_dict, json_dumps, json_loads
+import metrics
+from metrics import metrics_source, metrics_start, timed
+import_time = time.perf_counter() - startup_begin
 
 #
-# JSON format is: profile = [{"sound": "sounds/...", "text": "Name", "img": "imgs/...", "vol": 0.25, ", "start": 0.0,
-#                             "end": 0.0, "row": 0, "col": 0}, {"sound":...}]
-# Key descriptions: sound = sound filename (str type path, adjusted from "[file]" to "sounds/[file]")
+# JSON format is: profile = [{"id": 0, "sound": "sounds/...", "text": "Name", "img": "imgs/...", "vol": 0.25, ",
+#                             "start": 0.0, "end": 0.0, "row": 0, "col": 0}, {"id": 1, "sound":...}]
+# Key descriptions: id = stable id of the sound, never reused or shifted by deletes (int type, assigned at load for
+#                        profiles saved before ids existed)
+#                   sound = sound filename (str type path, adjusted from "[file]" to "sounds/[file]")
 #                   text = sound name to be displayed (str type)
 #                   img = image to be displayed by GUI (str type path, adjusted from "[file]" to
 #                         "imgs/[file]". Not implemented yet)
@@ -32,33 +60,341 @@ import pygame.mixer as mixer
 #                   end = where to stop sound playback in seconds (float type)
 #                   row = which row to place slot in GUI (int type, -1 is default for no GUI display)
 #                   col = which column to place slot in GUI (int type, -1 is default for no GUI display)
+#                   page = which page (bank) of the GUI board the slot is on (int type, 0 is the first page and the
+#                          default for profiles saved before pages existed)
+#                   chain = clips played gaplessly after the sound (optional list of {"sound", "start", "end"}
+#                           dicts, see soundentry.py)
+#                   loop = whether the sound and its chain repeat until stopped (optional bool, default false)
 # Test path: C:\Users\Ryan\PycharmProjects\RandomProjects\PiSound\sounds\Carl-spacito.mp3
+#
+# In memory the profile is a dict of id -> SoundEntry (in profile order, see soundentry.py), plus coord_index mapping
+# (page, row, col) -> id for every sound placed on the board, so lookups, moves and deletes never depend on list
+# positions. With lazy loading on, entries stay unconverted in pending_pages until their page is first used, packed as
+# a tuple of their values plus the tuple of their keys (shared by every entry with the same keys), which takes less
+# memory than either the parsed dicts or SoundEntry records.
 
 run_in_cmd = True           # When False, indicates running with GUI. Avoid cmd prmpt inputs and input loops
 file = "profile.json"
-profile = []
+journal_file = "profile.journal"
+profile: dict[int, SoundEntry] = {}
+coord_index: dict[tuple[int, int, int], int] = {}
+page_sizes: dict[int, int] = {}     # Page -> number of sounds placed on it
+pending_pages: dict[int, list[tuple]] = {}  # Page -> (keys, values) of entries not converted yet (lazy loading)
+entry_keys: dict[tuple, tuple] = {}         # Keys of pending entries, each distinct tuple stored once
+invalid_entries: list[dict] = []    # Entries that failed validation, kept as-is so saving never loses them
+next_id = 0
+lazy_load = False           # When True, entries are only converted when their page is first used
 
 default_vol = 25
+bank_budget = 64 * 1024 * 1024      # Bytes of decoded sound the sound bank keeps in memory (see soundbank.py)
+num_channels = 16           # Size of the playback engine's channel pool (how many sounds can overlap)
+steal_policy = "oldest"     # Which voice to cut when every channel is busy: "oldest", "quietest" or "retrigger"
+write_delay = 0.25          # Seconds profile changes are held so bursts of edits coalesce into one write
+storage_mode = "snapshot"   # "snapshot": rewrite profile.json on changes, "journal": append changes to journal_file
+journal_limit = 256 * 1024  # Journal size (bytes) past which it is folded back into profile.json
+volume_mode = "manual"      # "manual": play at each sound's volume, "normalize": volume is a loudness fader
+target_loudness = -20.0     # dBFS a sound at full volume is brought to in "normalize" mode
+board_rows = 4              # Slots per page of the GUI board, used to place imported sounds
+board_cols = 7
+import_workers = None       # Worker processes for import_sounds() (None is one per CPU)
+fast_start = False          # When True, back_init() opens the audio on a background thread (see audio_init())
+metrics_interval = 10.0     # Seconds between metrics reports, when metrics are enabled (see metrics.py)
+metrics_file = "metrics.json"   # JSON snapshot written with every metrics report
+
+profile_lock = threading.RLock()
+is_dirty = False
+batch_depth = 0
+flush_entry = None
+startup_times: dict[str, float] = {"imports": import_time}     # Startup phase -> seconds, in the order they ran
+audio_thread = None
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Times the startup phase name into startup_times."""
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_times[name] = time.perf_counter() - begin
+
+
+def startup_report():
+    """Returns the startup timing breakdown as printable lines. Phases run on the audio thread overlap the others."""
+    lines = [f"{name:<12} {took * 1000:8.1f} ms" for name, took in startup_times.items()]
+    lines.append(f"{'total':<12} {(time.perf_counter() - startup_begin) * 1000:8.1f} ms since backend import")
+    return "\n".join(lines)
 
 
 def get_profile():
+    load_all()
     return profile
 
 
+def get_by_coord(row: int, col: int, page: int = 0):
+    """Returns the sound placed at (row, col) on page of the board, or None if the slot is empty."""
+    if page in pending_pages:
+        load_page(page)
+    sid = coord_index.get((page, row, col))
+    return None if sid is None else profile[sid]
+
+
+def page_count():
+    """Returns the number of pages up to the last one holding a sound."""
+    return max([page for page, size in page_sizes.items() if size > 0] + list(pending_pages), default=0) + 1
+
+
+def index_sound(sel: SoundEntry):
+    """Places sel on the board. Raises ValueError if its slot already holds another sound."""
+    if sel.row >= 0 and sel.col >= 0:
+        holder = coord_index.get((sel.page, sel.row, sel.col), sel.id)
+        if holder != sel.id:
+            raise ValueError(f"Page {sel.page + 1}, row {sel.row}, column {sel.col} already holds sound {holder}")
+        coord_index[(sel.page, sel.row, sel.col)] = sel.id
+        page_sizes[sel.page] = page_sizes.get(sel.page, 0) + 1
+
+
+def unindex_sound(sel: SoundEntry):
+    if coord_index.get((sel.page, sel.row, sel.col)) == sel.id:
+        del coord_index[(sel.page, sel.row, sel.col)]
+        page_sizes[sel.page] -= 1
+
+
+def profile_sounds():
+    """Returns the filenames of every sound in the profile, including pages not loaded yet."""
+    with profile_lock:
+        names = {clip.sound for sel in profile.values() for clip in entry_clips(sel)}
+        for raws in pending_pages.values():
+            for raw in raws:
+                names.add(raw.get("sound"))
+                names.update(clip.get("sound") for clip in raw.get("chain") or () if isinstance(clip, dict))
+    return names
+
+
+def load_entry(raw: dict):
+    """Converts one profile.json entry and adds it to the profile. Invalid entries are set aside (and reported in the
+    command prompt) instead of stopping the whole profile from loading."""
+    try:
+        sel = entry_from_dict(raw)
+    except ValueError as err:
+        invalid_entries.append(raw)
+        if run_in_cmd:
+            print(err)
+        return
+    insert_loaded(sel)
+
+
+def insert_loaded(sel: SoundEntry):
+    """insert_sound() for entries read back from disk: an entry placed on a slot that is already taken (saved before
+    slots were checked) is kept off the board instead of being dropped."""
+    try:
+        insert_sound(sel)
+    except ValueError:
+        sel.row = sel.col = -1
+        insert_sound(sel)
+
+
+def load_page(page: int):
+    with profile_lock:
+        for keys, values in pending_pages.pop(page, []):
+            load_entry(dict(zip(keys, values)))
+
+
+def load_all():
+    with profile_lock:
+        for page in list(pending_pages):
+            load_page(page)
+
+
+def set_profile(entries: list[dict]):
+    """Replaces the in-memory profile with entries (as stored in profile.json), giving ids to entries without one.
+    With lazy_load on, entries are only grouped by page here and converted by load_page()."""
+    global profile, next_id
+
+    with profile_lock:
+        profile = {}
+        coord_index.clear()
+        page_sizes.clear()
+        pending_pages.clear()
+        entry_keys.clear()
+        invalid_entries.clear()
+        next_id = max((raw["id"] for raw in entries if isinstance(raw.get("id"), int)), default=-1) + 1
+        for raw in entries:
+            if not isinstance(raw.get("id"), int):
+                raw["id"] = next_id
+                next_id += 1
+            if lazy_load:
+                keys = tuple(raw)
+                pending_pages.setdefault(raw.get("page", 0), []).append((entry_keys.setdefault(keys, keys),
+                                                                         tuple(raw.values())))
+            else:
+                load_entry(raw)
+
+
+def profile_json():
+    """Returns the whole profile (including unconverted and invalid entries) in the profile.json format."""
+    with profile_lock:
+        entries = [entry_to_dict(sel) for sel in profile.values()]
+        for packed in pending_pages.values():
+            entries.extend(dict(zip(keys, values)) for keys, values in packed)
+        entries.extend(invalid_entries)
+        return json_dumps(entries)
+
+
+def insert_sound(sel: SoundEntry):
+    global next_id
+
+    with profile_lock:
+        if sel.id < 0:
+            sel.id = next_id
+        index_sound(sel)
+        next_id = max(next_id, sel.id + 1)
+        profile[sel.id] = sel
+
+
+def remove_sound(sid: int):
+    with profile_lock:
+        unindex_sound(profile[sid])
+        del profile[sid]
+
+
 def cmd_prmpt_off():
     global run_in_cmd
 
     run_in_cmd = False
 
 
+def lazy_load_on():
+    global lazy_load
+
+    lazy_load = True
+
+
+def fast_start_on():
+    global fast_start
+
+    fast_start = True
+
+
+@timed
 def update_json():
-    global profile
-    fp = open(file, "w")
-    json.dump(profile, fp)
-    fp.close()
+    """Marks the profile as changed. It is written out (atomically) write_delay seconds later on the writer thread (see
+    persist.write_later()), or when the outermost profile_batch() ends, so a burst of changes costs a single write."""
+    global is_dirty, flush_entry
+
+    count_request()
+    with profile_lock:
+        is_dirty = True
+        if batch_depth > 0:
+            return
+        if write_delay <= 0:
+            flush_json()
+        elif flush_entry is None:
+            flush_entry = scheduler.schedule(write_delay, lambda: write_later(flush_json))
+
+
+def flush_json():
+    """Writes the profile now if it has unsaved changes."""
+    global is_dirty, flush_entry
+
+    with profile_lock:
+        scheduler.cancel(flush_entry)
+        flush_entry = None
+        if not is_dirty:
+            return
+        data = profile_json()
+        is_dirty = False
+        try:
+            atomic_write(file, data)
+        except OSError:
+            is_dirty = True             # Still unsaved, the next change (or exit) tries again
+            raise
+
+
+def compact_journal():
+    """Folds the journal into a new profile.json snapshot and starts an empty journal for it."""
+    global is_dirty
+
+    with profile_lock:
+        data = profile_json()
+        is_dirty = False
+        try:
+            atomic_write(file, data)
+        except OSError:
+            is_dirty = True             # Still unsaved, the next change (or exit) tries again
+            raise
+        journal_reset(journal_file, snapshot_hash(data.encode()))
+
+
+def record_change(record: dict):
+    """Persists one profile change: appended to the journal in journal mode, otherwise through update_json()."""
+    if storage_mode != "journal":
+        update_json()
+        return
 
+    count_request()
+    with profile_lock:
+        if journal_append(journal_file, record) > journal_limit:
+            compact_journal()
 
-def add_sound(sound="", text="", vol=default_vol, start=0.0, end=0.0, row=-1, col=-1):
+
+def replay_journal(records: list[dict]):
+    """Applies the journal records to the profile. Records that do not apply, such as an edit of a sound that was set
+    aside as invalid (see load_entry()) or an invalid entry, are skipped (and reported in the command prompt)."""
+    load_all()
+    for record in records:
+        try:
+            replay_record(record)
+        except ValueError as err:
+            if run_in_cmd:
+                print(f"Skipped journal record: {err}")
+
+
+def replay_record(record: dict):
+    match record["op"]:
+        case "add":
+            insert_loaded(entry_from_dict(record["entry"]))
+        case "edit":
+            if record["id"] not in profile:
+                raise ValueError(f"No sound {record['id']} to edit")
+            sel = entry_from_dict(record["entry"])
+            sel.id = record["id"]
+            unindex_sound(profile[sel.id])
+            try:
+                index_sound(sel)
+            except ValueError:          # Slot taken, see insert_loaded()
+                sel.row = sel.col = -1
+            profile[sel.id] = sel
+        case "delete":
+            if record["id"] not in profile:
+                raise ValueError(f"No sound {record['id']} to delete")
+            remove_sound(record["id"])
+        case "import":
+            for raw in record["entries"]:
+                try:
+                    insert_loaded(entry_from_dict(raw))
+                except ValueError as err:
+                    if run_in_cmd:
+                        print(f"Skipped journal record: {err}")
+
+
+@contextmanager
+def profile_batch():
+    """Groups profile changes so they are written once, when the outermost batch ends."""
+    global batch_depth
+
+    with profile_lock:
+        batch_depth += 1
+    try:
+        yield
+    finally:
+        with profile_lock:
+            batch_depth -= 1
+            if batch_depth == 0:
+                flush_json()
+
+
+def add_sound(sound="", text="", vol=default_vol, start=0.0, end=0.0, row=-1, col=-1, page=0, chain=(), loop=False):
     if run_in_cmd:
         sound = input("Input sound filename: ")
         text = input("Input sound name: ")
@@ -79,49 +415,124 @@ def add_sound(sound="", text="", vol=default_vol, start=0.0, end=0.0, row=-1, co
     else:
         end = 0.0
 
-    new_dict = {"sound": sound, "text": text, "volume": vol / 100, "start": start, "end": end, "row": row,
-                "col": col}
+    new_sel = entry_check(SoundEntry(sound=sound, text=text, volume=vol / 100, start=start, end=end, row=row, col=col,
+                                     page=page, chain=tuple(chain), loop=loop))
+
+    insert_sound(new_sel)
+    record_change({"op": "add", "entry": entry_to_dict(new_sel)})
+
+    return new_sel.id, profile
 
-    profile.append(new_dict)
-    update_json()
 
-    return len(profile) - 1, profile
+def free_coords(page: int = 0):
+    """Yields the empty board slots as (page, row, col), in reading order from page on."""
+    while True:
+        load_page(page)
+        for row in range(board_rows):
+            for col in range(board_cols):
+                if (page, row, col) not in coord_index:
+                    yield page, row, col
+        page += 1
 
 
+def import_sounds(pattern: str, page: int = 0, progress=None):
+    """Adds every sound file matching pattern (a folder, or a glob such as "~/samples/*.wav") to the profile, placed in
+    the free slots from page on. Files from outside sounds/ are copied in. The files are decoded into the PCM cache on
+    a pool of worker processes, and the whole import is saved in a single write. progress, if given, is called with
+    (done, total) as files are processed. Returns a summary: files added, skipped files and throughput."""
+    begin = time.perf_counter()
+    pattern = os.path.expanduser(pattern)
+    if os.path.isdir(pattern):
+        paths = sorted(os.path.join(pattern, name) for name in os.listdir(pattern))
+    else:
+        paths = sorted(glob.glob(pattern))
+    paths = [path for path in paths if os.path.isfile(path)]
+
+    sound_dir = os.path.abspath("sounds")
+    names = []
+    copied = set()
+    skipped = []
+    os.makedirs(sound_dir, exist_ok=True)
+    for path in paths:
+        name = os.path.basename(path)
+        target = os.path.join(sound_dir, name)
+        if os.path.abspath(path) != target:
+            if not os.path.exists(target):
+                shutil.copy2(path, target)
+                copied.add(name)
+            elif not filecmp.cmp(path, target, shallow=False):
+                skipped.append(name)    # A different file with the same name is already in the library
+                continue
+        names.append(name)
+
+    engine_wait()
+    cache_build([os.path.join("sounds", name) for name in names], workers=import_workers, progress=progress)
+
+    entries = []
+    with profile_lock:
+        coords = free_coords(page)
+        for name in names:
+            try:
+                meta_get(name)          # Also checks the file is a sound the mixer can play
+            except (OSError, pygame.error):
+                skipped.append(name)
+                if name in copied:      # Not a sound, keep it out of the library
+                    os.remove(os.path.join(sound_dir, name))
+                continue
+            page_num, row, col = next(coords)
+            sel = SoundEntry(sound=name, text=os.path.splitext(name)[0], volume=default_vol / 100, row=row, col=col,
+                             page=page_num)
+            insert_sound(sel)
+            entries.append(entry_to_dict(sel))
+        if entries:
+            with profile_batch():
+                record_change({"op": "import", "entries": entries})
+    loudness_queue(raw["sound"] for raw in entries)
+
+    took = time.perf_counter() - begin
+    return {"added": len(entries), "skipped": skipped, "seconds": took,
+            "files_per_sec": len(paths) / took if took > 0 else 0.0}
+
+
+@timed
 def update_bounds(filename):
-    return mixer.Sound(filename).get_length()
+    return meta_duration(os.path.basename(filename))
 
 
-def play_sound(sel: dict):
+@timed
+def play_sound(sel: SoundEntry, slot=None, on_end=None):
     if run_in_cmd:
-        print("Now playing " + sel["text"] + "...")
-
-    mix.set_volume(float(sel["volume"]))
-    mix.load(os.path.join("sounds", sel["sound"]))
-    length = mixer.Sound(os.path.join("sounds", sel["sound"])).get_length()
-    mix.play()
-    mix.set_pos(float(sel["start"]))
-    if float(sel["end"]) > 0:
-        timer = threading.Timer(float(sel["end"]) - float(sel["start"]), lambda: stop_sound(timer))
-        timer.finished.clear()
-        timer.start()
-    else:
-        timer = threading.Timer(length, lambda: stop_sound(timer))
-        timer.finished.clear()
-        timer.start()
-    return timer
+        print("Now playing " + sel.text + "...")
+
+    engine_wait()               # Only waits if pressed while the audio is still starting up (fast_start)
+    sounds = [bank_get_trimmed(clip) for clip in entry_clips(sel)]
+    return engine_play(sounds[0], play_volume(sel), slot=slot, on_end=on_end, chain=sounds[1:], loop=sel.loop)
+
 
+def play_volume(sel: SoundEntry):
+    """Returns the mixer volume sel plays at, adjusted to target_loudness in "normalize" mode. Sounds not analyzed yet
+    play at their own volume."""
+    if volume_mode != "normalize":
+        return sel.volume
+    gain = loudness_gain(sel.sound, target_loudness)
+    return sel.volume if gain is None else min(1.0, sel.volume * gain)
 
-def stop_sound(timer: threading.Timer):
-    mix.stop()
-    if timer is not None:
-        timer.cancel()
-    timer.finished.set()
 
+@timed
+def stop_sound(voice: Voice = None):
+    if voice is None:           # Stop everything
+        engine_stop_all()
+        return
+    voice.stop()
 
-def edit_sound(num: int, sound="", text="", vol=-1, start=-1, end=-1, row=-1, col=-1):
+
+def edit_sound(sid: int, sound="", text="", vol=-1, start=-1, end=-1, row=-1, col=-1, page=-1, chain=None, loop=None):
+    """Changes sound sid. The changes are made to a copy that replaces the entry once saved, so a discarded edit leaves
+    it as it was. Raises ValueError (changing nothing) if the edited entry is invalid (see entry_from_dict()) or is
+    moved to a slot holding another sound."""
     global profile
-    sel = profile[num]
+    old = profile[sid]
+    sel = replace(old)
     cont_edit = True
 
     while cont_edit:
@@ -133,19 +544,25 @@ def edit_sound(num: int, sound="", text="", vol=-1, start=-1, end=-1, row=-1, co
             end = input("Input end time (seconds, leave blank for no change): ")
 
         if sound != "":
-            sel.update({"sound": sound})
+            sel.sound = sound
         if text != "":
-            sel.update({"text": text})
+            sel.text = text
         if vol != "" and vol != -1:
-            sel.update({"volume": int(vol) / 100})
+            sel.volume = int(vol) / 100
         if start != "" and start != -1:
-            sel.update({"start": float(start)})
+            sel.start = float(start)
         if end != "" and end != -1:
-            sel.update({"end": float(end)})
+            sel.end = float(end)
         if row != -1:
-            sel.update({"row": row})
+            sel.row = row
         if col != -1:
-            sel.update({"col": col})
+            sel.col = col
+        if page != -1:
+            sel.page = page
+        if chain is not None:
+            sel.chain = tuple(chain)
+        if loop is not None:
+            sel.loop = loop
 
         if run_in_cmd:
             while 1:
@@ -155,6 +572,11 @@ def edit_sound(num: int, sound="", text="", vol=-1, start=-1, end=-1, row=-1, co
                     case "P":
                         play_sound(sel)
                     case "S":
+                        try:
+                            entry_check(sel)
+                        except ValueError as err:
+                            print(err)
+                            continue
                         cont_edit = False
                         break
                     case "R":
@@ -167,65 +589,126 @@ def edit_sound(num: int, sound="", text="", vol=-1, start=-1, end=-1, row=-1, co
         else:
             cont_edit = False
 
-    profile[num] = sel
-    update_json()
+    sel = entry_check(sel)
+    with profile_lock:
+        unindex_sound(old)
+        try:
+            index_sound(sel)
+        except ValueError:
+            index_sound(old)
+            raise
+        profile[sid] = sel
+    if trim_key(sel) != trim_key(old) and trim_key(old) != old.sound:
+        bank_drop(trim_key(old))
+    record_change({"op": "edit", "id": sid, "entry": entry_to_dict(sel)})
 
 
-def delete_sound(num: int):
+def delete_sound(sid: int):
     global profile
 
     if run_in_cmd:
-        cmd = input("Are you sure you want to delete \"" + profile[num]["text"] + "\" [Y/N]? ").upper()
+        cmd = input("Are you sure you want to delete \"" + profile[sid].text + "\" [Y/N]? ").upper()
     else:
         cmd = "Y"
 
     match cmd:
         case "Y":
-            last_text = profile[num]["text"]
-            profile.remove(profile[num])
-            update_json()
+            last_text = profile[sid].text
+            if trim_key(profile[sid]) != profile[sid].sound:
+                bank_drop(trim_key(profile[sid]))
+            remove_sound(sid)
+            record_change({"op": "delete", "id": sid})
             if run_in_cmd:
                 print(last_text + "has been deleted.")
         case _:
             if run_in_cmd:
-                print(profile[num]["text"] + "will not be deleted.")
-
-
+                print(profile[sid].text + "will not be deleted.")
+
+
+def audio_init():
+    """Opens the mixer with the settings in audio.json, starts the playback engine and the library scanner, then
+    preloads the sound bank. Can be called again to apply changed settings; the bank is rebuilt if the mixer format
+    changed, since decoded sounds are stored in the mixer's format."""
+    with startup_phase("mixer"):
+        old_format = mixer.get_init()
+        if old_format is not None:
+            engine_stop_all()
+        audio_load(file)
+        mixer_open()
+        if old_format is not None and mixer.get_init() != old_format:
+            bank_clear()
+    with startup_phase("engine"):
+        engine_init(num_channels, steal_policy)
+    with startup_phase("index"):
+        meta_load(file)
+        library_start()
+    with startup_phase("preload"):
+        bank_set_budget(bank_budget)
+        bank_load(list(profile.values()))
+    if volume_mode == "normalize":
+        loudness_queue(profile_sounds())
+
+
+def audio_busy():
+    """Returns True while the fast-start audio thread is still starting the audio (see audio_init())."""
+    return audio_thread is not None and audio_thread.is_alive()
+
+
+@timed
 def back_init():
-    global profile
-    pygame.init()
-    is_new_profile = False
+    global audio_thread
 
-    try:
-        fp = open(file, "r")
-    except OSError:
-        is_new_profile = True
-        fp = open(file, "x")
-        fp.close()
-
-    if is_new_profile:
-        profile = []
-    else:
+    with startup_phase("profile"):
         try:
-            profile = json.load(fp)
+            with open(file, "rb") as fp:
+                data = fp.read()
         except OSError:
-            profile = []
-        fp.close()
+            data = b""
+            fp = open(file, "x")
+            fp.close()
+
+        try:
+            set_profile(json_loads(data))
+        except ValueError:                  # Unreadable or empty (just created) profile
+            set_profile([])
+
+    with startup_phase("journal"):
+        # The journal is read in either storage mode, so switching modes never drops changes
+        header, records = journal_read(journal_file)
+        is_current = header is not None and header.get("snapshot") == snapshot_hash(data)
+        if is_current and records:
+            replay_journal(records)
+            compact_journal()               # Start from a clean journal so nothing is ever appended after a torn record
+        if storage_mode == "journal":
+            if not is_current:
+                journal_reset(journal_file, snapshot_hash(data))
+        elif header is not None:
+            os.remove(journal_file)
+    atexit.register(flush_json)
+    atexit.register(meta_flush)
+    if metrics.enabled:
+        metrics_source("bank", bank_stats)
+        metrics_source("cache", cache_stats)
+        metrics_source("writes", write_stats)
+        metrics_start(metrics_interval, metrics_file)
+
+    if fast_start:
+        audio_thread = threading.Thread(target=audio_init, name="PiSound audio init", daemon=True)
+        audio_thread.start()
+    else:
+        audio_init()
 
 
 def back_main():                        # Used as a model for how the GUI should operate.
     global profile
     is_running = True
     mode = "M"                          # Modes: "M": Main, "E": Edit Mode, "T": Trash Mode
-    timer = threading.Timer(0, stop_sound)
+    voice = None
 
     if run_in_cmd:
         back_init()
 
     while is_running:
-        # Runs /every/ time to keep values updated
-        keys = len(profile)
-
         match mode:                     # Mode selector
             # Edit Mode
             case "E":
@@ -237,8 +720,11 @@ def back_main():                        # Used as a model for how the GUI should
 
                 if cmd.isdigit():
                     num = int(cmd)
-                    if num < keys:
-                        edit_sound(num)
+                    if num in profile:
+                        try:
+                            edit_sound(num)
+                        except ValueError as err:
+                            print(err)
                     else:
                         if run_in_cmd:
                             print("No such sound exists...")
@@ -263,7 +749,7 @@ def back_main():                        # Used as a model for how the GUI should
 
                 if cmd.isdigit():
                     num = int(cmd)
-                    if num < keys:
+                    if num in profile:
                         delete_sound(num)
                     else:
                         if run_in_cmd:
@@ -282,15 +768,15 @@ def back_main():                        # Used as a model for how the GUI should
             case _:  # Main (Play) Mode
                 if run_in_cmd:
                     cmd = input("Select sound to play (numeric), stop playing sound (S), enter Edit Mode (E)," +
-                                "Add Sound(A), or Quit (Q): ").upper()
+                                "Add Sound(A), Import Sounds (I), or Quit (Q): ").upper()
                 else:
                     cmd = "0"
 
                 if cmd.isdigit():
                     num = int(cmd)
-                    if num < keys:
+                    if num in profile:
                         sel = profile[num]
-                        timer = play_sound(sel)
+                        voice = play_sound(sel)
                     else:
                         if run_in_cmd:
                             print("No such sound exists...")
@@ -298,13 +784,23 @@ def back_main():                        # Used as a model for how the GUI should
 
                 match cmd:
                     case "S":           # Stop playing sound
-                        stop_sound(timer)
+                        stop_sound(voice)
                     case "A":           # Add new sound
-                        add_sound()
+                        try:
+                            add_sound()
+                        except ValueError as err:
+                            print(err)
+                    case "I":           # Import a folder or glob of sounds
+                        result = import_sounds(input("Input folder or glob to import: "),
+                                               progress=lambda done, total: print(f"\rDecoding {done}/{total}",
+                                                                                  end=""))
+                        print(f"\nImported {result['added']} sound(s) in {result['seconds']:.1f} s " +
+                              f"({result['files_per_sec']:.1f} files/s), skipped {len(result['skipped'])}")
                     case "E":           # Mode changer
                         mode = "E"
                     case "Q":           # Quit
                         is_running = False
+                        flush_json()
                         if run_in_cmd:
                             print("See ya!")
                     case _:
@@ -0,0 +1,393 @@
+"""
+File: bench.py
+
+Description: Benchmark suite of PiSound's backend and GUI hot paths, with regression checking against a baseline.
+
+Run as "python bench.py" from anywhere. Everything runs in a scratch folder on synthetic data: a library of generated
+sine wave WAV files and generated profiles, so no real sounds or profile are needed and every run measures the same
+thing. Audio goes through SDL's dummy driver unless SDL_AUDIODRIVER is already set. The benchmarks are
+    startup     back_init() for growing profiles, until the grid could be shown and until the audio is ready
+    play        play_sound() press-to-play latency with the sound bank cold (missed on every press) and warm
+    retrigger   rapid presses of one slot (retrigger policy): time per press and threads alive at most
+    load        parsing and converting a 10,000 sound profile, eagerly and lazily, and the memory it keeps
+    write       update_json() plus the write it leads to, for growing profiles
+    bounds      update_bounds() with the metadata index cold and warm
+    gui         populate, mode switches and page flips of the real grid, on a hidden Tk root (skipped without a
+                display; use xvfb-run on headless machines)
+    daemon      command-to-audio round trip of the socket daemon (daemon.py), one at a time and pipelined
+"python bench.py play write" only runs the benchmarks named.
+
+Every result is a number where lower is better (milliseconds, microseconds or MB, see the name). --json FILE writes them
+as JSON, --save-baseline FILE stores them as the baseline to compare later runs with, and --baseline FILE compares this
+run against one: results worse than the baseline by more than --tolerance (and by more than noise_floor) are reported
+as regressions and make the exit status 1. Single measurements are medians of several runs; 95th percentiles are
+reported but not checked, as they swing too much between runs on a busy machine.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from array import array
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")       # Must be set before pygame opens any audio
+import pygame
+import pygame.mixer as mixer
+import backend
+import daemon
+import engine
+import soundbank
+from metaindex import meta_forget
+from soundentry import SoundEntry
+
+library_size = 50           # Synthetic sound files, profiles reuse them
+clip_seconds = 2.0
+profile_sizes = (100, 1000, 10000)
+noise_floor = 0.05          # Changes smaller than this (in the result's unit) are never regressions
+results: dict[str, float] = {}
+
+
+def synthetic_wav(path: str, freq: float, seconds: float = clip_seconds, rate: int = 44100):
+    """Writes a 16 bit stereo sine wave of freq Hz."""
+    second = array("h")
+    for i in range(rate):
+        sample = int(8000 * math.sin(2 * math.pi * freq * i / rate))
+        second.extend((sample, sample))
+    data = second.tobytes()
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(data * int(seconds) + data[:int(seconds % 1 * rate) * 4])
+
+
+def synthetic_library(count: int = library_size):
+    os.makedirs("sounds", exist_ok=True)
+    for i in range(count):
+        synthetic_wav(os.path.join("sounds", f"sound{i}.wav"), 220.0 + 10 * i)
+
+
+def synthetic_profile(count: int, per_page: int = 28, cols: int = 7):
+    return [{"id": i, "sound": f"sound{i % library_size}.wav", "text": f"Sound {i}", "volume": 0.25, "start": 0.0,
+             "end": 0.0, "row": (i % per_page) // cols, "col": i % cols, "page": i // per_page} for i in range(count)]
+
+
+def record(name: str, value: float):
+    results[name] = value
+
+
+def median(values: list[float]):
+    return sorted(values)[len(values) // 2]
+
+
+def report(name: str, times: list[float]):
+    """Prints the spread of times (seconds) and records their median and 95th percentile in ms."""
+    times = sorted(times)
+    p50 = times[len(times) // 2] * 1000
+    p95 = times[min(len(times) - 1, int(len(times) * 0.95))] * 1000
+    print(f"{name}: min {times[0] * 1000:.3f} ms, median {p50:.3f} ms, p95 {p95:.3f} ms, max {times[-1] * 1000:.3f} ms "
+          f"({len(times)} runs)")
+    record(f"{name}_p50_ms", p50)
+    record(f"{name}_p95_ms", p95)
+
+
+def wait_playing(timeout=1.0):
+    deadline = time.perf_counter() + timeout
+    while not mixer.get_busy():
+        if time.perf_counter() > deadline:
+            break
+
+
+def bench_startup(sizes=profile_sizes, runs: int = 5):
+    # Transcode the library into the PCM cache first, so every size measures loading the same way
+    soundbank.bank_load([SoundEntry(sound=f"sound{i}.wav", text="") for i in range(library_size)])
+    for count in sizes:
+        with open(backend.file, "w") as fp:
+            json.dump(synthetic_profile(count), fp)
+        shown = []
+        ready = []
+        for i in range(runs):
+            soundbank.bank_clear()
+            backend.fast_start = True
+            start = time.perf_counter()
+            backend.back_init()
+            shown.append(time.perf_counter() - start)
+            backend.audio_thread.join()
+            ready.append(time.perf_counter() - start)
+            backend.fast_start = False
+        shown = median(shown)
+        ready = median(ready)
+        print(f"Startup ({count} sounds): grid after {shown * 1000:.1f} ms, audio ready after {ready * 1000:.1f} ms "
+              f"(median of {runs})")
+        record(f"startup_{count}_grid_ms", shown * 1000)
+        record(f"startup_{count}_audio_ms", ready * 1000)
+    backend.set_profile([])
+
+
+def time_presses(sel: SoundEntry, runs: int, cold: bool):
+    times = []
+    for i in range(runs):
+        if cold:
+            soundbank.bank_drop(sel.sound)
+        start = time.perf_counter()
+        backend.play_sound(sel)
+        wait_playing()
+        times.append(time.perf_counter() - start)
+        backend.stop_sound()
+    return times
+
+
+def bench_play(filename: str = "sound0.wav", runs: int = 50):
+    sel = SoundEntry(sound=filename, text=filename, volume=0.0)
+    report("play_cold", time_presses(sel, runs, cold=True))
+    soundbank.bank_load([sel])
+    report("play_warm", time_presses(sel, runs, cold=False))
+
+
+def bench_retrigger(filename: str = "sound0.wav", presses: int = 500, runs: int = 5):
+    sel = SoundEntry(sound=filename, text=filename, volume=0.0)
+    soundbank.bank_load([sel])
+    policy = engine.steal_policy
+    engine.steal_policy = "retrigger"
+    base = threading.active_count()
+    most = base
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        for j in range(presses):
+            backend.play_sound(sel, slot="bench")
+            most = max(most, threading.active_count())
+        times.append(time.perf_counter() - start)
+        backend.stop_sound()
+    took = median(times)
+    engine.steal_policy = policy
+    print(f"Retrigger: {presses} presses in {took * 1000:.1f} ms ({presses / took:.0f} presses/s), {most} threads at "
+          f"most ({base} before)")
+    record("retrigger_press_us", took / presses * 1e6)
+    record("retrigger_extra_threads", most - base)
+
+
+def load_first_page(data: bytes, lazy: bool):
+    backend.lazy_load = lazy
+    backend.set_profile(backend.json_loads(data))
+    backend.get_by_coord(0, 0, 0)           # What the GUI needs to show the first page
+
+
+def time_load(data: bytes, lazy: bool, runs: int = 5):
+    times = []
+    for i in range(runs):
+        backend.set_profile([])
+        gc.collect()
+        gc.disable()            # As timeit does, so collections triggered by earlier benchmarks' garbage do not count
+        start = time.perf_counter()
+        load_first_page(data, lazy)
+        times.append(time.perf_counter() - start)
+        gc.enable()
+
+    backend.set_profile([])
+    gc.collect()
+    tracemalloc.start()
+    load_first_page(data, lazy)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return median(times), size
+
+
+def bench_load(count: int = 10000):
+    data = json.dumps(synthetic_profile(count)).encode()
+    for name, lazy in (("eager", False), ("lazy", True)):
+        took, size = time_load(data, lazy)
+        print(f"Profile load ({count} sounds, {name}): {took * 1000:.1f} ms, {size / 1024 / 1024:.1f} MB resident")
+        record(f"load_{name}_ms", took * 1000)
+        record(f"load_{name}_mb", size / 1024 / 1024)
+    backend.lazy_load = False
+    backend.set_profile([])
+
+
+def bench_write(sizes=profile_sizes, runs: int = 20):
+    for count in sizes:
+        backend.set_profile(synthetic_profile(count))
+        times = []
+        for i in range(runs):
+            start = time.perf_counter()
+            backend.update_json()
+            backend.flush_json()
+            times.append(time.perf_counter() - start)
+        report(f"write_{count}", times)
+    backend.set_profile([])
+    backend.flush_json()
+
+
+def bench_bounds(filename: str = "sound0.wav", runs: int = 50):
+    cold = []
+    for i in range(runs):
+        meta_forget(filename)
+        start = time.perf_counter()
+        backend.update_bounds(filename)
+        cold.append(time.perf_counter() - start)
+    report("bounds_cold", cold)
+
+    warm = []
+    for i in range(runs):
+        start = time.perf_counter()
+        backend.update_bounds(filename)
+        warm.append(time.perf_counter() - start)
+    report("bounds_warm", warm)
+
+
+def bench_gui(runs: int = 20):
+    try:
+        import raspgui
+        import tkinter as tk
+    except ImportError as err:
+        print(f"GUI: skipped ({err})")
+        return
+    backend.set_profile(synthetic_profile(raspgui.num_slots_w * raspgui.num_slots_h * 3))
+    try:
+        raspgui.mode_text = raspgui.init()
+    except tk.TclError as err:
+        print(f"GUI: skipped, no display ({err})")
+        backend.set_profile([])
+        return
+    raspgui.root.withdraw()
+    raspgui.init_populate()
+    raspgui.root.update_idletasks()
+
+    def timed_runs(*steps):
+        times = []
+        for i in range(runs):
+            start = time.perf_counter()
+            steps[i % len(steps)]()
+            raspgui.root.update_idletasks()
+            times.append(time.perf_counter() - start)
+        return times
+
+    report("gui_populate", timed_runs(raspgui.populate))
+    report("gui_mode_switch", timed_runs(raspgui.edit_populate, raspgui.play_populate))
+    report("gui_page_flip", timed_runs(lambda: raspgui.show_page(1), lambda: raspgui.show_page(0)))
+    raspgui.root.destroy()
+    backend.set_profile([])
+
+
+def bench_daemon(filename: str = "sound0.wav", runs: int = 200, path: str = "bench.sock"):
+    sel = SoundEntry(sound=filename, text=filename, volume=0.0)
+    backend.insert_sound(sel)
+    soundbank.bank_load([sel])
+    daemon.daemon_start(path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(path)
+    replies = client.makefile("rb")
+
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        client.sendall(f"play {sel.id}\n".encode())
+        replies.readline()
+        times.append(time.perf_counter() - start)
+    report("daemon_round_trip", times)
+
+    batches = []
+    for i in range(5):
+        start = time.perf_counter()
+        client.sendall(f"play {sel.id}\n".encode() * runs)
+        for j in range(runs):
+            replies.readline()
+        batches.append(time.perf_counter() - start)
+    took = median(batches)
+    print(f"Daemon pipelined: {runs} plays in {took * 1000:.1f} ms ({runs / took:.0f} commands/s, median of 5)")
+    record("daemon_pipelined_us", took / runs * 1e6)
+
+    client.sendall(b"stop\n")
+    replies.readline()
+    client.close()
+    os.remove(path)
+    backend.remove_sound(sel.id)
+
+
+benchmarks = {"startup": bench_startup, "play": bench_play, "retrigger": bench_retrigger, "load": bench_load,
+              "write": bench_write, "bounds": bench_bounds, "gui": bench_gui, "daemon": bench_daemon}
+
+
+def environment():
+    return {"python": platform.python_version(), "pygame": pygame.version.ver, "machine": platform.machine(),
+            "system": platform.system(), "audio_driver": os.environ.get("SDL_AUDIODRIVER"),
+            "mixer": mixer.get_init()}
+
+
+def compare(baseline: dict, tolerance: float):
+    """Prints every result next to its baseline value and returns the names of the regressions. 95th percentiles are
+    only shown, being too noisy to gate on."""
+    regressions = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name}: {value:.3f} (new)")
+            continue
+        change = (value - old) / old if old > 0 else 0.0
+        worse = change > tolerance and value - old > noise_floor and not name.endswith("_p95_ms")
+        if worse:
+            regressions.append(name)
+        print(f"{name}: {old:.3f} -> {value:.3f} ({change:+.0%}){'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def bench_main():
+    parser = argparse.ArgumentParser(description="PiSound benchmark suite (synthetic sounds, dummy audio driver).")
+    parser.add_argument("only", nargs="*", metavar="BENCHMARK",
+                        help=f"benchmarks to run (default all: {', '.join(benchmarks)})")
+    parser.add_argument("--json", metavar="FILE", help="write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with the baseline in FILE")
+    parser.add_argument("--save-baseline", metavar="FILE", help="store the results as the baseline in FILE")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="how much worse than the baseline a result may be (default 0.5, i.e. 50%%)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch folder (its path is printed)")
+    args = parser.parse_args()
+    unknown = [name for name in args.only if name not in benchmarks]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    out_files = [os.path.abspath(f) if f else None for f in (args.json, args.baseline, args.save_baseline)]
+
+    workdir = tempfile.mkdtemp(prefix="pisound-bench-")
+    home = os.getcwd()
+    os.chdir(workdir)
+    try:
+        backend.cmd_prmpt_off()
+        synthetic_library()
+        backend.back_init()                 # Empty profile, opens the audio
+        for name in args.only or benchmarks:
+            benchmarks[name]()
+        backend.stop_sound()
+        backend.flush_json()
+    finally:
+        os.chdir(home)
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    json_file, baseline_file, save_file = out_files
+    output = {"time": time.time(), "environment": environment(), "results": results}
+    for path in (json_file, save_file):
+        if path is not None:
+            with open(path, "w") as fp:
+                json.dump(output, fp, indent=2)
+    if baseline_file is not None:
+        with open(baseline_file) as fp:
+            baseline = json.load(fp)["results"]
+        print(f"\nCompared with {baseline_file} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    bench_main()
@@ -0,0 +1,66 @@
+"""
+File: cmdqueue.py
+
+Description: Queue between the GUI and the backend, so backend work never runs on the Tk event thread.
+
+Starting a sound can mean loading or decoding a file (a bank miss), and saving an edit can mean a disk write, so the
+GUI post()s commands, which a single worker thread runs in order, and the worker reports back through an event queue
+that the GUI empties from its own loop with drain(). Events are (kind, command name, slot, value) and every command
+produces exactly one of
+    ("started", "play", slot, voice)    a play command started its voice
+    ("done", name, slot, result)        any other command finished, result is what it returned
+    ("errored", name, slot, error)      the command raised error
+and every started voice later produces ("finished", "play", slot, voice) when it ends or is stopped. slot is whatever
+the GUI passed to post(), to know which slot an event is about.
+"""
+import queue
+import threading
+from backend import add_sound, delete_sound, edit_sound, play_sound, stop_sound
+
+handlers = {"play": play_sound, "stop": stop_sound, "add": add_sound, "edit": edit_sound, "delete": delete_sound}
+commands = queue.Queue()
+events = queue.Queue()
+worker = None
+
+
+def command_loop():
+    while True:
+        name, slot, args, kwargs = commands.get()
+        try:
+            if name == "play":
+                voice = play_sound(*args, slot=slot, on_end=lambda v, s=slot: events.put(("finished", "play", s, v)))
+                events.put(("started", name, slot, voice))
+            else:
+                events.put(("done", name, slot, handlers[name](*args, **kwargs)))
+        except Exception as err:    # Whatever failed, the worker must outlive it or every later command would hang
+            events.put(("errored", name, slot, err))
+        finally:
+            commands.task_done()
+
+
+def post(name: str, *args, slot=None, **kwargs):
+    """Queues the backend command name ("play", "stop", "add", "edit" or "delete", see handlers) with args and kwargs.
+    Returns at once, the outcome comes back as an event (see drain())."""
+    global worker
+
+    if name not in handlers:
+        raise ValueError(f"Unknown command \"{name}\"")
+    if worker is None or not worker.is_alive():
+        worker = threading.Thread(target=command_loop, name="PiSound commands", daemon=True)
+        worker.start()
+    commands.put((name, slot, args, kwargs))
+
+
+def wait_idle():
+    """Waits until every command posted so far has run."""
+    commands.join()
+
+
+def drain():
+    """Returns every event reported since the last drain, oldest first, without waiting."""
+    drained = []
+    while True:
+        try:
+            drained.append(events.get_nowait())
+        except queue.Empty:
+            return drained
@@ -0,0 +1,188 @@
+"""
+File: daemon.py
+
+Description: Headless PiSound: keeps the audio engine and sound bank warm and plays sounds on commands sent over a local
+socket, so scripts and other machines can trigger sounds without the GUI or the command prompt.
+
+Run as "python daemon.py" (Unix socket pisound.sock in the PiSound folder), "python daemon.py --unix PATH" or
+"python daemon.py --tcp HOST:PORT". Clients send one command per line, either as words or as a JSON object, and get
+one JSON reply per command, in order:
+    play ID [VOLUME]        {"cmd": "play", "id": 3, "volume": 40}      plays sound ID (at VOLUME percent if given)
+    stop [ID]               {"cmd": "stop", "id": 3}                    stops the sound's voices (every sound if no ID)
+    volume ID VOLUME        {"cmd": "volume", "id": 3, "volume": 40}    sets (and saves) the sound's volume, also on
+                                                                        its voices that are playing
+    list                    {"cmd": "list"}                             lists the sounds in the profile
+    stats                   {"cmd": "stats"}                            sound bank and write counters
+    ping                    {"cmd": "ping"}
+Replies are {"ok": true, ...} or {"ok": false, "error": "..."}; a "tag" given in a JSON command is echoed back.
+Commands may be pipelined: a client can send many lines without waiting, they are run in order as they arrive and the
+replies are written in the same order. A play is replied to once the sound has started on its mixer channel, so the
+round trip of a play is the command-to-audio latency (see bench.py).
+
+Connections are served by asyncio on one thread. Commands run on that thread too, since a play from the warm sound bank
+takes microseconds; a sound missing from the bank is loaded before its reply.
+"""
+import argparse
+import asyncio
+import os
+import threading
+from dataclasses import replace
+import pygame
+from backend import Voice, back_init, bank_stats, cmd_prmpt_off, edit_sound, entry_to_dict, get_profile, json_dumps, \
+    json_loads, play_sound, stop_sound, write_stats
+
+socket_path = "pisound.sock"
+voices: dict[int, list[Voice]] = {}     # Sound id -> voices started for it by the daemon
+
+
+def parse(line: str):
+    """Turns a command line (words or JSON) into a command dict. Raises ValueError for malformed commands."""
+    line = line.strip()
+    if line.startswith("{"):
+        command = json_loads(line)
+        if not isinstance(command, dict):
+            raise ValueError("command must be a JSON object")
+        return command
+
+    words = line.split()
+    if not words:
+        raise ValueError("empty command")
+    command = {"cmd": words[0].lower()}
+    for key, word in zip(("id", "volume"), words[1:]):
+        command[key] = int(word)
+    return command
+
+
+def live(sid: int):
+    alive = [v for v in voices.get(sid, []) if v.is_alive()]
+    voices[sid] = alive
+    return alive
+
+
+def run_command(command: dict):
+    """Runs one command and returns its reply."""
+    profile = get_profile()
+    sid = command.get("id")
+    if sid is not None and sid not in profile:
+        raise ValueError(f"no sound with id {sid}")
+
+    match command.get("cmd"):
+        case "play":
+            if sid is None:
+                raise ValueError("play needs a sound id")
+            sel = profile[sid]
+            if "volume" in command:
+                sel = replace(sel, volume=min(max(float(command["volume"]), 0.0), 100.0) / 100)
+            voice = play_sound(sel)
+            live(sid).append(voice)
+            return {"ok": True, "id": sid, "channel": voice.index}
+        case "stop":
+            if sid is None:
+                stop_sound()
+                voices.clear()
+            else:
+                for voice in live(sid):
+                    stop_sound(voice)
+                voices.pop(sid, None)
+            return {"ok": True}
+        case "volume":
+            if sid is None or "volume" not in command:
+                raise ValueError("volume needs a sound id and a volume")
+            vol = min(max(int(command["volume"]), 0), 100)
+            edit_sound(sid, vol=vol)
+            for voice in live(sid):
+                voice.volume = vol / 100
+                voice.channel.set_volume(voice.volume)
+            return {"ok": True, "id": sid, "volume": vol}
+        case "list":
+            return {"ok": True, "sounds": [entry_to_dict(sel) for sel in profile.values()]}
+        case "stats":
+            return {"ok": True, "bank": bank_stats(), "writes": write_stats()}
+        case "ping":
+            return {"ok": True}
+        case other:
+            raise ValueError(f"unknown command {other!r}")
+
+
+def handle_line(line: str):
+    tag = None
+    try:
+        command = parse(line)
+        tag = command.get("tag")
+        reply = run_command(command)
+    except (ValueError, TypeError, KeyError, OSError, pygame.error) as err:     # Such as a sound file gone missing
+        reply = {"ok": False, "error": str(err)}
+    if tag is not None:
+        reply["tag"] = tag
+    return reply
+
+
+async def serve_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while line := await reader.readline():
+            writer.write(json_dumps(handle_line(line.decode(errors="replace"))).encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def daemon_serve(path: str = None, host: str = None, port: int = None, started: threading.Event = None):
+    """Serves clients on the Unix socket path, or on host:port over TCP if port is given, until cancelled."""
+    if port is not None:
+        server = await asyncio.start_server(serve_client, host or "127.0.0.1", port)
+    else:
+        path = path or socket_path
+        if os.path.exists(path):        # Left behind by a daemon that did not shut down cleanly
+            os.remove(path)
+        server = await asyncio.start_unix_server(serve_client, path)
+    if started is not None:
+        started.set()
+    async with server:
+        await server.serve_forever()
+
+
+def daemon_start(path: str = None, host: str = None, port: int = None):
+    """Serves clients on a background thread (with its own event loop) next to whatever else the program does. Returns
+    once the socket is listening, or raises what kept it from listening (OSError for a port in use, for example). The
+    backend must already be initialized."""
+    started = threading.Event()
+    failed = []
+
+    def run():
+        try:
+            asyncio.run(daemon_serve(path, host, port, started))
+        except Exception as err:
+            failed.append(err)
+        finally:
+            started.set()           # Also when it never got to listen, so the caller does not wait forever
+
+    thread = threading.Thread(target=run, name="PiSound daemon", daemon=True)
+    thread.start()
+    started.wait()
+    if failed:
+        raise failed[0]
+    return thread
+
+
+def daemon_main():
+    parser = argparse.ArgumentParser(description="Headless PiSound, controlled over a local socket.")
+    parser.add_argument("--unix", metavar="PATH", help=f"Unix socket to listen on (default {socket_path})")
+    parser.add_argument("--tcp", metavar="HOST:PORT", help="listen on TCP instead of a Unix socket")
+    args = parser.parse_args()
+
+    host = port = None
+    if args.tcp is not None:
+        host, _, port = args.tcp.rpartition(":")
+        port = int(port)
+    cmd_prmpt_off()
+    back_init()                         # Not lazy: every page is loaded and preloaded into the bank up front
+    try:
+        asyncio.run(daemon_serve(args.unix, host or None, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    daemon_main()
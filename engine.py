@@ -0,0 +1,214 @@
+"""
+File: engine.py
+
+Description: Polyphonic playback engine built on a pool of pygame.mixer.Channel objects.
+
+The engine plays the decoded sounds from the sound bank on a configurable pool of mixer channels, so many sounds can
+overlap and fire back to back without stopping or reloading anything.
+
+Every play returns a Voice, the handle for that one sound playing on one channel, which can be used to stop that voice
+alone. The end of every voice is a deadline on the scheduler (see scheduler.py), so no thread is started per play.
+When every channel is busy a voice is stolen according to the steal policy:
+    "oldest" = stop the voice that started first
+    "quietest" = stop the voice playing at the lowest volume
+    "retrigger" = a slot pressed again restarts on its own channel, otherwise fall back to "oldest"
+
+engine_meters() reports the position and peak level of every playing voice, for displays.
+
+A voice can play a chain of clips (a sequence, or a loop). The clip after the playing one is always queued on the
+voice's channel (Channel.queue), so the mixer itself switches to it on the exact sample the playing clip ends, with no
+gap. A scheduler deadline at the end of each clip then queues the clip after that, so a chain costs no thread either.
+"""
+import threading
+import time
+import pygame.mixer as mixer
+import scheduler
+from loudness import envelope, envelope_request, meter_block
+from metrics import count, timed
+
+steal_policies = ("oldest", "quietest", "retrigger")
+
+num_channels = 16
+steal_policy = "oldest"
+channels: list[mixer.Channel] = []
+voices: dict[int, "Voice"] = {}     # Channel index -> last voice started on it
+lock = threading.RLock()
+handover_retry = 0.005      # Seconds until a clip end is looked at again when the mixer has not switched clips yet
+ready = threading.Event()           # Set once the channel pool exists (the mixer may be opened on a background thread)
+
+
+class Voice:
+    slot = None
+    index = -1
+    channel = None
+    sound = None
+    volume = 1.0
+    started = 0.0
+    end_entry = None
+    on_end = None               # Called with the voice once, when it finishes or is stopped
+    clips = ()                  # Every sound of the voice's chain, in order (just its one sound if not chained)
+    clip = 0                    # Index in clips of the sound playing
+    loop = False                # After the last clip, start over from the first
+    queued = None               # Clip queued on the channel to follow the one playing, None at the end of the chain
+
+    def __init__(self, slot, index: int, channel, sound, volume: float):
+        self.slot = slot
+        self.index = index
+        self.channel = channel
+        self.sound = sound
+        self.volume = volume
+        self.started = time.perf_counter()
+        self.finished = threading.Event()
+
+    def is_alive(self):
+        if self.finished.is_set():
+            return False
+        if self.queued is not None:     # Mid-chain the channel reads idle for an instant at each handover
+            return True
+        return self.channel.get_busy() and self.channel.get_sound() is self.sound
+
+    def position(self):
+        """Returns the seconds played so far of the playing clip. The mixer does not report channel positions, so this
+        is read from the clock the clip started on (never accumulated per tick, so it does not drift)."""
+        return min(time.perf_counter() - self.started, self.sound.get_length())
+
+    def level(self):
+        """Returns the current peak level (0 to 1, after volume), or None while it is not known (see engine_play()), and
+        always without NumPy."""
+        env = envelope(self.sound)
+        if env is None:
+            return None
+        return float(env[min(int(self.position() / meter_block), len(env) - 1)]) * self.volume
+
+    def queue_next(self):
+        following = self.clip + 1
+        if following >= len(self.clips):
+            following = 0 if self.loop else None
+        self.queued = None if following is None else self.clips[following]
+        if self.queued is not None:
+            self.channel.queue(self.queued)
+
+    def clip_end(self):
+        """Deadline at the end of the playing clip: moves on to the clip the mixer switched to and queues the one after
+        it, or finishes the voice at the end of its chain."""
+        with lock:
+            if self.finished.is_set():
+                return
+            if self.queued is None or not self.channel.get_busy():
+                self.finish()
+                return
+            if self.channel.get_queue() is not None:    # The mixer is a little behind the clock, look again shortly
+                self.end_entry = scheduler.schedule(handover_retry, self.clip_end)
+                return
+            self.started += self.sound.get_length()     # Clips play back to back, so this never drifts
+            self.clip = self.clip + 1 if self.clip + 1 < len(self.clips) else 0
+            self.sound = self.queued
+            self.queue_next()
+            self.end_entry = scheduler.schedule_at(self.started + self.sound.get_length(), self.clip_end)
+
+    def finish(self):
+        if self.finished.is_set():
+            return
+        self.finished.set()
+        if self.on_end is not None:
+            self.on_end(self)
+
+    def stop(self):
+        with lock:              # Not while clip_end() queues the next clip, which would restart the channel
+            scheduler.cancel(self.end_entry)
+            if self.is_alive():
+                self.channel.stop()     # Also drops the queued clip
+            self.finish()
+
+
+def engine_init(num=None, policy=None):
+    """Sets up the channel pool. Must be called after the mixer has been initialized."""
+    global num_channels, steal_policy, channels
+
+    if num is not None:
+        num_channels = num
+    if policy is not None:
+        if policy not in steal_policies:
+            raise ValueError(f"Unknown steal policy \"{policy}\"")
+        steal_policy = policy
+
+    with lock:
+        mixer.set_num_channels(num_channels)
+        channels = [mixer.Channel(i) for i in range(num_channels)]
+        voices.clear()
+    ready.set()
+
+
+def engine_wait(timeout: float = None):
+    """Waits until the mixer is open (engine_play() sets up the channel pool itself if engine_init() has not run yet).
+    Returns False if it still isn't after timeout seconds."""
+    if mixer.get_init():
+        return True
+    return ready.wait(timeout)
+
+
+def pick_channel(slot, policy: str):
+    """Returns the index of the channel the next voice for slot should play on."""
+    if policy == "retrigger" and slot is not None:
+        for index, v in voices.items():
+            if v.slot is slot and v.is_alive():
+                return index
+
+    for index, channel in enumerate(channels):
+        if not channel.get_busy():
+            return index
+
+    alive = [(index, v) for index, v in voices.items() if v.is_alive()]
+    if not alive:
+        return 0
+    if policy == "quietest":
+        return min(alive, key=lambda iv: iv[1].volume)[0]
+    return min(alive, key=lambda iv: iv[1].started)[0]
+
+
+@timed
+def engine_play(sound, volume: float, slot=None, policy=None, on_end=None, chain=(), loop=False):
+    """Plays sound at volume on a free (or stolen) channel and returns its Voice. The sounds in chain follow it without
+    gaps, and with loop the whole sequence repeats until the voice is stopped. on_end, if given, is called with the
+    voice when it finishes or is stopped (from whichever thread ends it, so it must be quick). Raises ValueError for an
+    empty sound, which would crash the mixer."""
+    if any(snd.get_length() <= 0 for snd in (sound, *chain)):
+        raise ValueError("Cannot play an empty sound")
+    if not channels:
+        engine_init()
+
+    with lock:
+        index = pick_channel(slot, policy or steal_policy)
+        old = voices.get(index)
+        if old is not None:
+            if old.is_alive():
+                count("voices_stolen")
+            old.stop()
+        channel = channels[index]
+        channel.play(sound)
+        channel.set_volume(volume)
+        voice = Voice(slot, index, channel, sound, volume)
+        voice.on_end = on_end
+        voice.clips = (sound, *chain)
+        voice.loop = loop
+        voice.queue_next()
+        voice.end_entry = scheduler.schedule_at(voice.started + sound.get_length(), voice.clip_end)
+        voices[index] = voice
+    for snd in voice.clips:         # Level meters read these, they are worked out in the background
+        envelope_request(snd)
+    return voice
+
+
+def engine_meters():
+    """Returns (voice, position, level) for every voice still playing, see Voice.position() and Voice.level()."""
+    with lock:
+        alive = [v for v in voices.values() if v.is_alive()]
+    return [(v, v.position(), v.level()) for v in alive]
+
+
+def engine_stop_all():
+    with lock:
+        for v in voices.values():
+            v.stop()
+        voices.clear()
+    mixer.stop()
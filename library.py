@@ -0,0 +1,98 @@
+"""
+File: library.py
+
+Description: Background service that keeps a sorted, in-memory listing of the sound and image libraries.
+
+library_start() scans sounds/ and imgs/ once on a worker thread, off the Tk main loop, and then keeps the listing up
+to date incrementally by polling the folders' mtimes (only a folder whose mtime changed is listed again, and only the
+added/removed names are applied). New sound files are also indexed in the metadata index (see metaindex.py) from the
+worker thread, from their headers only (never by decoding them), so their lengths are usually known before they are
+first picked.
+
+library_list() hands out the sorted listing at once, optionally filtered by a name prefix.
+"""
+import bisect
+import os
+import threading
+import pygame
+from metaindex import meta_forget, meta_get
+
+lib_dirs = ("sounds", "imgs")
+poll_interval = 2.0         # Seconds between folder mtime checks
+listings: dict[str, list[str]] = {d: [] for d in lib_dirs}
+dir_mtimes: dict[str, float] = {}
+lock = threading.Lock()
+ready = threading.Event()
+stop_event = threading.Event()
+worker = None
+
+
+def rescan(folder: str):
+    """Lists folder again if its mtime changed and applies the difference to its listing."""
+    try:
+        mtime = os.stat(folder).st_mtime
+    except OSError:             # Missing folder is an empty library
+        mtime = -1.0
+    if dir_mtimes.get(folder) == mtime:
+        return
+    dir_mtimes[folder] = mtime
+
+    names = set(os.listdir(folder)) if mtime >= 0 else set()
+    with lock:
+        listing = listings.setdefault(folder, [])
+        old = set(listing)
+        for name in old - names:
+            del listing[bisect.bisect_left(listing, name)]
+        for name in names - old:
+            bisect.insort(listing, name)
+
+    if folder == "sounds":
+        for name in old - names:
+            meta_forget(name)
+        for name in sorted(names - old):
+            try:
+                meta_get(name, decode=False)
+            except (OSError, pygame.error):
+                continue
+
+
+def library_loop():
+    while True:
+        for folder in lib_dirs:
+            rescan(folder)
+        ready.set()
+        if stop_event.wait(poll_interval):
+            break
+
+
+def library_start():
+    global worker
+
+    if worker is not None and worker.is_alive():
+        return
+    stop_event.clear()
+    worker = threading.Thread(target=library_loop, name="PiSound library", daemon=True)
+    worker.start()
+
+
+def library_stop():
+    stop_event.set()
+
+
+def library_ready():
+    """Returns True once the scanner's first scan is done, from when library_list() is complete."""
+    return ready.is_set()
+
+
+def library_list(folder: str, prefix: str = ""):
+    """Returns the sorted file names in folder that start with prefix (case sensitive), as listed so far. Starts the
+    scanner if it is not running yet, but never waits for it nor scans on the caller's thread (usually Tk's): until
+    library_ready() the listing may be incomplete."""
+    library_start()
+    with lock:
+        listing = listings.get(folder, [])
+        if not prefix:
+            return list(listing)
+        first = bisect.bisect_left(listing, prefix)
+        last = bisect.bisect_left(listing, prefix + "\uffff", first)
+        return listing[first:last]
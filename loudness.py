@@ -0,0 +1,199 @@
+"""
+File: loudness.py
+
+Description: Loudness analysis of the sound library, and the per-sound gains used by the "normalize" volume mode.
+
+A clip's loudness is measured over its decoded samples in the style of LUFS (ITU-R BS.1770, without the K-weighting
+filter): the mean power of 400 ms blocks, ignoring silent blocks (below -70 dBFS) and blocks more than 10 dB below the
+mean of the rest, in dB relative to full scale. The sample peak is measured too. Both are computed with vectorized NumPy
+and stored in the metadata index (see metaindex.py), so each file is only analyzed once. NumPy is optional: without it
+no analysis is done and every sound plays at its own volume.
+
+In normalize mode (backend.volume_mode) a sound's volume acts as a loudness fader instead of a raw gain: it is scaled by
+the gain that brings the clip to target_loudness, so clips at the same volume sound equally loud. Gains are worked out
+once per file and kept in memory, so playing a sound costs only a dict lookup.
+
+envelope() gives the short-term peak level of a decoded sound over time, which the engine reads for level meters, once
+envelope_request() has worked it out (the engine requests it when a sound starts playing).
+
+Analyses run on a small thread pool (NumPy releases the GIL while it works), never on the caller's thread.
+loudness_scan() queues the whole library, `python loudness.py` analyzes it and prints the results.
+"""
+import math
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+import pygame.mixer as mixer
+from metaindex import meta_cached, meta_get, meta_load, meta_save, meta_update
+from pcmcache import cached_sound
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sound_dir = "sounds"
+analysis_workers = 2
+block_length = 0.4          # Seconds per loudness block
+silence_gate = -70.0        # dBFS, blocks quieter than this are silence (and the loudness of an all-silent clip)
+relative_gate = -10.0       # dB below the mean of the non-silent blocks
+# Mixer sample size -> (sample type, offset of the zero level, full scale)
+sample_formats = {8: ("uint8", 128, 128), -8: ("int8", 0, 128), 16: ("uint16", 32768, 32768),
+                  -16: ("int16", 0, 32768), 32: ("float32", 0, 1)}
+meter_block = 0.02          # Seconds per block of a level meter envelope
+envelopes = weakref.WeakKeyDictionary()     # mixer.Sound -> its envelope, None while it is being worked out
+gains: dict[str, float] = {}        # Filename -> gain bringing it to target_loudness (at the target of last use)
+gains_target = None
+queued: set[str] = set()
+lock = threading.Lock()
+pool = None
+
+
+def analyze(snd: mixer.Sound):
+    """Returns the gated loudness and the peak (both in dBFS) of snd's samples."""
+    freq, size, channels = mixer.get_init()
+    kind, zero, scale = sample_formats[size]
+    samples = np.frombuffer(snd.get_raw(), dtype=kind)
+    samples = (samples.astype(np.float32) - zero) / scale
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    if not samples.size:
+        return {"loudness": silence_gate, "peak": silence_gate}
+
+    peak = float(np.abs(samples).max())
+    power = np.square(samples).mean(axis=1)
+    block = max(1, round(block_length * freq))
+    count = len(power) // block
+    if count == 0:              # Shorter than a block, measure it whole
+        blocks = power.mean(keepdims=True)
+    else:
+        blocks = power[:count * block].reshape(count, block).mean(axis=1)
+    blocks = blocks[blocks > 10 ** (silence_gate / 10)]
+    if blocks.size:
+        blocks = blocks[blocks >= blocks.mean() * 10 ** (relative_gate / 10)]
+    loudness = 10 * math.log10(blocks.mean()) if blocks.size else silence_gate
+    return {"loudness": round(loudness, 2), "peak": round(20 * math.log10(peak), 2) if peak > 0 else silence_gate}
+
+
+def envelope_job(snd: mixer.Sound):
+    freq, size, channels = mixer.get_init()
+    kind, zero, scale = sample_formats[size]
+    samples = np.abs(np.frombuffer(snd.get_raw(), dtype=kind).astype(np.float32) - zero) / scale
+    block = max(1, round(meter_block * freq)) * channels
+    count = max(1, -(-len(samples) // block))
+    padded = np.zeros(count * block, dtype=np.float32)
+    padded[:len(samples)] = samples
+    env = padded.reshape(count, block).max(axis=1)
+    with lock:
+        envelopes[snd] = env
+
+
+def envelope_request(snd: mixer.Sound):
+    """Queues working out snd's envelope on the background pool, unless it is known or queued already. Returns at
+    once."""
+    if np is None:
+        return
+    with lock:
+        if snd in envelopes:
+            return
+        envelopes[snd] = None
+        pool_start().submit(envelope_job, snd)
+
+
+def envelope(snd: mixer.Sound):
+    """Returns the peak level (0 to 1) of every meter_block of snd, for level meters. None until envelope_request() has
+    worked it out, and always without NumPy. Never works anything out itself, so it is cheap enough for the Tk
+    thread."""
+    with lock:
+        return envelopes.get(snd)
+
+
+def loudness_get(filename: str):
+    """Returns the loudness analysis of sounds/filename, analyzing the file first if it has not been (or has changed
+    since). Returns None if NumPy is not installed."""
+    if np is None:
+        return None
+    meta = meta_get(filename)
+    if "loudness" not in meta:
+        meta_update(filename, analyze(cached_sound(os.path.join(sound_dir, filename))))
+        meta = meta_get(filename)
+    return {"loudness": meta["loudness"], "peak": meta["peak"]}
+
+
+def analyze_job(filename: str):
+    try:
+        loudness_get(filename)
+    except (OSError, pygame.error):
+        pass
+    finally:
+        with lock:
+            queued.discard(filename)
+            gains.pop(filename, None)
+
+
+def pool_start():
+    """Returns the background analysis pool, starting it first if needed. Call with lock held."""
+    global pool
+
+    if pool is None:
+        pool = ThreadPoolExecutor(max_workers=analysis_workers, thread_name_prefix="PiSound loudness")
+    return pool
+
+
+def loudness_queue(filenames):
+    """Queues sounds/filename analyses on the background pool for every filename not analyzed yet."""
+    if np is None:
+        return
+    with lock:
+        pool_start()
+        for filename in filenames:
+            if filename in queued:
+                continue
+            meta = meta_cached(filename)
+            if meta is not None and "loudness" in meta:
+                continue
+            queued.add(filename)
+            pool.submit(analyze_job, filename)
+
+
+def loudness_scan():
+    """Queues every file in the library for analysis."""
+    loudness_queue(sorted(os.listdir(sound_dir)))
+
+
+def loudness_gain(filename: str, target: float):
+    """Returns the gain that brings sounds/filename to target dBFS, without clipping, or None if the file has not been
+    analyzed yet (in which case it is queued)."""
+    global gains_target
+
+    with lock:
+        if target != gains_target:
+            gains.clear()
+            gains_target = target
+        gain = gains.get(filename)
+    if gain is not None:
+        return gain
+
+    meta = meta_cached(filename)
+    if meta is None or "loudness" not in meta:
+        loudness_queue([filename])
+        return None
+    gain = min(10 ** ((target - meta["loudness"]) / 20), 10 ** (-meta["peak"] / 20))
+    with lock:
+        gains[filename] = gain
+    return gain
+
+
+if __name__ == "__main__":
+    if np is None:
+        raise SystemExit("Loudness analysis needs NumPy")
+    mixer.init()
+    meta_load()
+    for name in sorted(os.listdir(sound_dir)):
+        try:
+            result = loudness_get(name)
+        except (OSError, pygame.error):
+            continue
+        print(f"{name:<40} {result['loudness']:7.2f} dBFS  peak {result['peak']:7.2f} dBFS")
+    meta_save()
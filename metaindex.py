@@ -0,0 +1,179 @@
+"""
+File: metaindex.py
+
+Description: Persistent index of audio metadata (duration, sample rate, channels, file size and mtime) for the files
+in sounds/.
+
+The index keeps the metadata of every file in memory and on disk (sounds_meta.json, beside profile.json), so a file is
+only probed again when its size or mtime changes.
+
+Files are probed from their header where possible: WAV files with the wave module, other formats (MP3, OGG, FLAC, ...)
+with mutagen when it is installed. Without a readable header the length is taken from the file's PCM cache (see
+pcmcache.py) if it has one, and only as a last resort is the file decoded by the mixer, without caching the result:
+only sounds the profile plays are ever transcoded. Those report the mixer's sample rate and channel count. The library
+scanner (see library.py) indexes new files from their headers only, so it never decodes the whole library.
+"""
+import json
+import os
+import threading
+import wave
+import pygame
+import pygame.mixer as mixer
+import scheduler
+from persist import atomic_write, write_later
+from pcmcache import cache_path
+
+try:
+    import mutagen
+except ImportError:
+    mutagen = None
+
+sound_dir = "sounds"
+meta_file = "sounds_meta.json"
+index: dict[str, dict] = {}
+lock = threading.Lock()
+save_lock = threading.Lock()    # Held while sounds_meta.json is written, so two saves never write it at once
+save_entry = None
+
+
+def meta_load(profile_file: str = "profile.json"):
+    """Reads the index stored beside profile_file."""
+    global meta_file
+
+    meta_file = os.path.join(os.path.dirname(profile_file), "sounds_meta.json")
+    try:
+        with open(meta_file, "r") as fp:
+            loaded = json.load(fp)
+    except (OSError, ValueError):
+        loaded = {}
+    with lock:
+        index.clear()
+        index.update(loaded)
+
+
+def meta_save():
+    global save_entry
+
+    with save_lock:
+        with lock:
+            save_entry = None
+            data = json.dumps(index)
+        atomic_write(meta_file, data)
+
+
+def save_later():
+    write_later(meta_save)      # From the scheduler, which must not wait for the disk
+
+
+def meta_flush():
+    """Writes the index now if it has changes waiting for meta_save()."""
+    with lock:
+        entry = save_entry
+    if entry is not None:
+        scheduler.cancel(entry)
+        meta_save()
+
+
+def probe_header(path: str):
+    """Reads the metadata of the sound file at path from its header, or returns None if it has no readable one."""
+    if path.lower().endswith(".wav"):
+        try:
+            with wave.open(path, "rb") as wf:
+                rate = wf.getframerate()
+                return {"duration": wf.getnframes() / rate, "rate": rate, "channels": wf.getnchannels()}
+        except (wave.Error, EOFError):
+            pass
+    if mutagen is not None:
+        try:
+            info = mutagen.File(path)
+        except mutagen.MutagenError:
+            info = None
+        if info is not None and info.info.length > 0:
+            return {"duration": info.info.length, "rate": getattr(info.info, "sample_rate", 0),
+                    "channels": getattr(info.info, "channels", 0)}
+    return None
+
+
+def probe(path: str, decode: bool = True):
+    """Reads the metadata of the sound file at path: from its header, else from its PCM cache file, else (if decode) by
+    decoding it, without caching the samples. Returns None if decode is False and there is no header."""
+    meta = probe_header(path)
+    if meta is not None or not decode:
+        return meta
+    if not mixer.get_init():
+        raise pygame.error("mixer not initialized")
+    freq, size, channels = mixer.get_init()
+    try:
+        frames = os.path.getsize(cache_path(path)) // (channels * (abs(size) // 8))
+        return {"duration": frames / freq, "rate": freq, "channels": channels}
+    except OSError:             # Not cached
+        pass
+    return {"duration": mixer.Sound(path).get_length(), "rate": freq, "channels": channels}
+
+
+def meta_get(filename: str, decode: bool = True):
+    """Returns the metadata of sounds/filename, probing the file only if it is new or changed since it was indexed. With
+    decode False a file without a readable header is not probed and None is returned (see probe())."""
+    global save_entry
+
+    path = os.path.join(sound_dir, filename)
+    st = os.stat(path)
+    with lock:
+        meta = index.get(filename)
+    if meta is not None and meta["size"] == st.st_size and meta["mtime"] == st.st_mtime:
+        return meta
+
+    meta = probe(path, decode)
+    if meta is None:
+        return None
+    meta.update({"size": st.st_size, "mtime": st.st_mtime})
+    with lock:
+        index[filename] = meta
+        if save_entry is None:      # Coalesce index writes made in quick succession
+            save_entry = scheduler.schedule(1.0, save_later)
+    return meta
+
+
+def meta_update(filename: str, values: dict):
+    """Stores extra values (loudness analysis, for example) in the index entry of filename. They are dropped whenever
+    the file changes and is probed again."""
+    global save_entry
+
+    with lock:
+        meta = index.get(filename)
+        if meta is None:
+            return
+        meta.update(values)
+        if save_entry is None:
+            save_entry = scheduler.schedule(1.0, save_later)
+
+
+def meta_cached(filename: str):
+    """Returns the index entry of filename as last probed (without checking the file for changes), or None."""
+    with lock:
+        return index.get(filename)
+
+
+def meta_forget(filename: str):
+    global save_entry
+
+    with lock:
+        if index.pop(filename, None) is not None and save_entry is None:
+            save_entry = scheduler.schedule(1.0, save_later)
+
+
+def meta_duration(filename: str):
+    return meta_get(filename)["duration"]
+
+
+def meta_scan():
+    """Indexes every file in sounds/ and forgets files that no longer exist."""
+    names = set(os.listdir(sound_dir))
+    with lock:
+        for gone in [name for name in index if name not in names]:
+            del index[gone]
+    for name in sorted(names):
+        try:
+            meta_get(name)
+        except (OSError, pygame.error):
+            continue
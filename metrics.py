@@ -0,0 +1,138 @@
+"""
+File: metrics.py
+
+Description: Opt-in instrumentation of PiSound's hot paths: call latencies, counters and thread counts.
+
+Functions decorated with @timed record how long every call takes, and count() counts events, but only while metrics
+are enabled (set PISOUND_METRICS=1 in the environment, or call metrics_enable()). When disabled a decorated call only
+checks one flag before calling straight through, so the instrumentation can stay in place.
+
+Latencies are kept per function as the last `window` calls, from which metrics_snapshot() works out the p50/p95/p99 and
+max in milliseconds. metrics_start() reports them every few seconds as a log line and, if given a file, as a JSON
+snapshot (written atomically, so it can be watched from another program).
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+import scheduler
+from persist import atomic_write, write_later
+from soundentry import json_dumps
+
+enabled = os.environ.get("PISOUND_METRICS", "") not in ("", "0")
+window = 4096               # Latest calls per function the percentiles are worked out from
+samples: dict[str, deque] = {}
+calls: dict[str, int] = {}
+counters: dict[str, int] = {}
+sources: dict = {}          # Name -> function returning stats (such as bank_stats()) included in every snapshot
+lock = threading.Lock()
+report_entry = None
+
+
+def record(name: str, took: float):
+    with lock:
+        history = samples.get(name)
+        if history is None:
+            history = samples[name] = deque(maxlen=window)
+        history.append(took)
+        calls[name] = calls.get(name, 0) + 1
+
+
+def timed(funct):
+    """Decorator recording the latency of every call to funct (under its name) while metrics are enabled."""
+    name = funct.__name__
+
+    @functools.wraps(funct)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return funct(*args, **kwargs)
+        begin = time.perf_counter()
+        try:
+            return funct(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - begin)
+    return wrapper
+
+
+def count(name: str, amount: int = 1):
+    if not enabled:
+        return
+    with lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def metrics_source(name: str, funct):
+    """Includes funct()'s stats dict in every snapshot, under name."""
+    sources[name] = funct
+
+
+def percentile(ordered: list[float], q: float):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def metrics_snapshot():
+    """Returns the recorded latencies (ms, over the latest calls), counters, thread counts and the stats of every
+    metrics_source()."""
+    with lock:
+        histories = {name: sorted(history) for name, history in samples.items()}
+        totals = dict(calls)
+        counted = dict(counters)
+    latency = {}
+    for name, ordered in histories.items():
+        latency[name] = {"calls": totals[name], "p50_ms": percentile(ordered, 0.50) * 1000,
+                         "p95_ms": percentile(ordered, 0.95) * 1000, "p99_ms": percentile(ordered, 0.99) * 1000,
+                         "max_ms": ordered[-1] * 1000}
+    threads = [t.name for t in threading.enumerate()]
+    return {"time": time.time(), "latency": latency, "counters": counted, "threads": len(threads),
+            "thread_names": threads, **{name: funct() for name, funct in sources.items()}}
+
+
+def metrics_line(snapshot: dict):
+    parts = [f"{name} n={lat['calls']} p50={lat['p50_ms']:.3f} p95={lat['p95_ms']:.3f} p99={lat['p99_ms']:.3f} ms"
+             for name, lat in sorted(snapshot["latency"].items())]
+    parts += [f"{name}={value}" for name, value in sorted(snapshot["counters"].items())]
+    parts.append(f"threads={snapshot['threads']}")
+    return "metrics: " + " | ".join(parts)
+
+
+def metrics_start(interval: float = 10.0, snapshot_file: str = None, log: bool = True):
+    """Enables metrics and reports them every interval seconds: a log line (if log) and a JSON snapshot to
+    snapshot_file (if given)."""
+    global report_entry
+
+    def report():
+        snapshot = metrics_snapshot()
+        if log:
+            print(metrics_line(snapshot))
+        if snapshot_file is not None:
+            atomic_write(snapshot_file, json_dumps(snapshot))
+
+    def report_later():
+        write_later(report)     # On the writer thread, the scheduler must not wait for the disk
+        return enabled
+
+    metrics_enable()
+    scheduler.cancel(report_entry)
+    report_entry = scheduler.every(interval, report_later)
+
+
+def metrics_enable():
+    global enabled
+
+    enabled = True
+
+
+def metrics_disable():
+    """Stops recording and reporting. What was recorded so far is kept."""
+    global enabled
+
+    enabled = False
+    scheduler.cancel(report_entry)
+
+
+def metrics_reset():
+    with lock:
+        samples.clear()
+        calls.clear()
+        counters.clear()
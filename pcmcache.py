@@ -0,0 +1,169 @@
+"""
+File: pcmcache.py
+
+Description: On-disk cache of the sound library transcoded to raw PCM in the mixer's format.
+
+Each file is decoded once and its samples are written to cache/ exactly as the mixer plays them. Loading a sound (bank
+preload, or a bank miss) is then a memory-mapped read of that file with no decoding or resampling.
+
+Cache files are named after the source file, a hash of its contents, its mtime and the mixer format, for example
+    cache/SharkYeah.mp3.3f2a9c0d41be.1720000000000000000.44100x16x2.pcm
+so editing a sound or changing the audio settings (see audioconfig.py) simply misses the old file. cache_prune() removes
+files no longer referenced.
+
+cache_build() transcodes many files on a pool of worker processes (bulk imports, or `python pcmcache.py` for the whole
+library). The workers open the mixer with SDL's dummy audio driver, in the parent's format, so they never touch the
+sound card.
+"""
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pygame
+import pygame.mixer as mixer
+from persist import atomic_write
+from metrics import timed
+
+cache_dir = "cache"
+hashes: dict[str, tuple] = {}       # Source path -> (size, mtime_ns, content hash), files are only hashed when changed
+lock = threading.Lock()
+hits = 0
+misses = 0
+
+
+def source_hash(path: str):
+    st = os.stat(path)
+    with lock:
+        known = hashes.get(path)
+    if known is not None and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+        return known[2], st.st_mtime_ns
+
+    sha = hashlib.sha1()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1024 * 1024), b""):
+            sha.update(block)
+    digest = sha.hexdigest()[:12]
+    with lock:
+        hashes[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest, st.st_mtime_ns
+
+
+def cache_path(path: str, fmt: tuple = None):
+    """Returns the cache file for the sound file at path in mixer format fmt (the current mixer format by default)."""
+    freq, size, channels = fmt or mixer.get_init()
+    digest, mtime = source_hash(path)
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{digest}.{mtime}.{freq}x{abs(size)}x{channels}.pcm")
+
+
+def read_pcm(pcm_path: str):
+    """Returns a mixer.Sound made from the cache file at pcm_path, or None if it is missing or empty."""
+    try:
+        with open(pcm_path, "rb") as fp:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mixer.Sound(buffer=mm)       # The samples are copied into the mixer, the map can be closed
+    except (OSError, ValueError):
+        return None
+
+
+def transcode(path: str, pcm_path: str):
+    """Decodes the sound file at path and writes its samples to pcm_path. Returns the decoded mixer.Sound."""
+    snd = mixer.Sound(path)
+    os.makedirs(os.path.dirname(pcm_path), exist_ok=True)
+    with lock:                      # atomic_write() uses a fixed temp name, two threads must not share it
+        atomic_write(pcm_path, snd.get_raw())
+    return snd
+
+
+@timed
+def cached_sound(path: str):
+    """Returns the sound file at path as a mixer.Sound, from the cache if it has been transcoded before, otherwise
+    decoding it and caching the result."""
+    global hits, misses
+
+    pcm_path = cache_path(path)
+    snd = read_pcm(pcm_path)
+    if snd is not None:
+        hits += 1
+        return snd
+    misses += 1
+    try:
+        return transcode(path, pcm_path)
+    except OSError:                 # Read-only or full storage, play it uncached
+        return mixer.Sound(path)
+
+
+def worker_init(fmt: tuple):
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    freq, size, channels = fmt
+    mixer.init(frequency=freq, size=size, channels=channels)
+
+
+def worker_transcode(path: str, pcm_path: str):
+    try:
+        transcode(path, pcm_path)
+    except (OSError, pygame.error):
+        return False
+    return True
+
+
+def cache_build(paths, workers: int = None, progress=None):
+    """Transcodes the sound files at paths that are not cached yet, on a pool of worker processes. progress, if given,
+    is called with (done, total) after each file. Returns the number of files transcoded."""
+    fmt = mixer.get_init()
+    if fmt is None:
+        raise pygame.error("mixer not initialized")
+    todo = {}
+    for path in paths:
+        try:
+            pcm_path = cache_path(path, fmt)
+        except OSError:
+            continue
+        if not os.path.exists(pcm_path):
+            todo[path] = pcm_path
+    if not todo:
+        return 0
+
+    os.makedirs(cache_dir, exist_ok=True)
+    done = 0
+    made = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=worker_init, initargs=(fmt,)) as pool:
+        for ok in pool.map(worker_transcode, todo.keys(), todo.values()):
+            done += 1
+            made += ok
+            if progress is not None:
+                progress(done, len(todo))
+    return made
+
+
+def cache_prune(paths):
+    """Deletes every cache file (PCM or derived from it, see peaks.py) that does not belong to the current cache file of
+    one of the sound files at paths."""
+    keep = set()
+    for path in paths:
+        try:
+            keep.add(os.path.basename(cache_path(path))[:-len(".pcm")])
+        except OSError:
+            continue
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext in (".pcm", ".peaks") and stem not in keep:
+            os.remove(os.path.join(cache_dir, name))
+
+
+def cache_stats():
+    return {"hits": hits, "misses": misses}
+
+
+if __name__ == "__main__":
+    mixer.init()
+    library = [os.path.join("sounds", name) for name in sorted(os.listdir("sounds"))]
+    count = cache_build(library, progress=lambda done, total: print(f"\r{done}/{total}", end=""))
+    print(f"\nTranscoded {count} file(s)")
+    cache_prune(library)
@@ -0,0 +1,148 @@
+"""
+File: peaks.py
+
+Description: Multi-resolution min/max peak data of the sound library, for drawing waveforms.
+
+Drawing a waveform straight from the samples means going through millions of values (a 10 minute clip is over 26
+million at 44.1 kHz) for a few hundred pixels. Instead every sound gets a peak pyramid, computed once with vectorized
+NumPy downsampling: level 0 holds the lowest and highest sample (mixed down to mono) of every 256 frames, and each next
+level summarizes 4 buckets of the level below, down to a few hundred buckets. peaks_view() picks the coarsest level that
+still has a bucket per pixel, so drawing any clip at any zoom only touches about as many values as there are pixels.
+
+Pyramids are cached beside the PCM cache (see pcmcache.py), under the same source hash and mtime, so a file is only
+analyzed again when it changes. peaks_request() builds them on a background thread, so the Tk thread never decodes or
+analyzes audio. NumPy is optional: without it there is no waveform.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+import pygame.mixer as mixer
+from persist import atomic_write
+from pcmcache import cache_path, cached_sound
+from loudness import sample_formats
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sound_dir = "sounds"
+base_bucket = 256           # Frames per level 0 bucket
+level_factor = 4            # Buckets of a level summarized by one bucket of the next
+min_buckets = 256           # Levels stop once they would have fewer buckets than this
+peaks: dict[str, dict] = {}         # Cache file -> loaded pyramid
+lock = threading.Lock()
+pool = None
+
+
+def peaks_path(path: str):
+    return cache_path(path)[:-len(".pcm")] + ".peaks"
+
+
+def build(snd: mixer.Sound):
+    """Returns the peak pyramid of snd: {"rate": ..., "frames": ..., "levels": [(frames per bucket, mins, maxes)]}."""
+    freq, size, channels = mixer.get_init()
+    kind, zero, scale = sample_formats[size]
+    samples = np.frombuffer(snd.get_raw(), dtype=kind)
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    frames = len(samples)
+    count = max(1, -(-frames // base_bucket))
+    padded = np.zeros((count * base_bucket, channels), dtype=np.float32)
+    padded[:frames] = (samples.astype(np.float32) - zero) / scale
+    padded = padded.reshape(count, base_bucket * channels)
+    mins = padded.min(axis=1)
+    maxes = padded.max(axis=1)
+
+    levels = [(base_bucket, mins, maxes)]
+    while len(mins) // level_factor >= min_buckets:
+        count = len(mins) // level_factor
+        mins = mins[:count * level_factor].reshape(count, level_factor).min(axis=1)
+        maxes = maxes[:count * level_factor].reshape(count, level_factor).max(axis=1)
+        levels.append((levels[-1][0] * level_factor, mins, maxes))
+    return {"rate": freq, "frames": frames, "levels": levels}
+
+
+def save(pyramid: dict, file: str):
+    arrays = {"rate": np.array(pyramid["rate"]), "frames": np.array(pyramid["frames"])}
+    for i, (spb, mins, maxes) in enumerate(pyramid["levels"]):
+        arrays[f"spb{i}"] = np.array(spb)
+        arrays[f"min{i}"] = (mins * 32767).astype(np.int16)
+        arrays[f"max{i}"] = (maxes * 32767).astype(np.int16)
+    data = io.BytesIO()
+    np.savez(data, **arrays)
+    atomic_write(file, data.getvalue())
+
+
+def load(file: str):
+    with np.load(file) as arrays:
+        levels = []
+        while f"spb{len(levels)}" in arrays:
+            i = len(levels)
+            levels.append((int(arrays[f"spb{i}"]), arrays[f"min{i}"] / np.float32(32767),
+                           arrays[f"max{i}"] / np.float32(32767)))
+        return {"rate": int(arrays["rate"]), "frames": int(arrays["frames"]), "levels": levels}
+
+
+def peaks_get(filename: str):
+    """Returns the peak pyramid of sounds/filename, from memory, from the cache file or built from the samples. Slow
+    the first time, call it off the Tk thread (see peaks_request()). Returns None without NumPy."""
+    if np is None:
+        return None
+    path = os.path.join(sound_dir, filename)
+    file = peaks_path(path)
+    with lock:
+        pyramid = peaks.get(file)
+    if pyramid is not None:
+        return pyramid
+    try:
+        pyramid = load(file)
+    except (OSError, ValueError, KeyError):
+        pyramid = build(cached_sound(path))
+        try:
+            save(pyramid, file)
+        except OSError:
+            pass
+    with lock:
+        peaks[file] = pyramid
+    return pyramid
+
+
+def request_job(filename: str):
+    try:
+        return peaks_get(filename)
+    except (OSError, pygame.error):
+        return None
+
+
+def peaks_request(filename: str):
+    """Returns a Future for peaks_get(filename), worked out on a background thread. The Future's result is None if the
+    file could not be read."""
+    global pool
+
+    with lock:
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PiSound peaks")
+    return pool.submit(request_job, filename)
+
+
+def peaks_view(pyramid: dict, width: int, start: float = 0.0, end: float = 0.0):
+    """Returns (mins, maxes), width values each between -1 and 1, for drawing the part of the sound between start and
+    end seconds (end <= 0 is the end of the sound) in width pixels. Fewer values are returned when zoomed in further
+    than the finest level."""
+    first = max(0, round(start * pyramid["rate"]))
+    last = pyramid["frames"] if end <= 0 else min(pyramid["frames"], round(end * pyramid["rate"]))
+    per_pixel = max(1, (last - first) / max(1, width))
+    spb, mins, maxes = pyramid["levels"][0]
+    for level in pyramid["levels"]:
+        if level[0] <= per_pixel:
+            spb, mins, maxes = level
+    lo = min(first // spb, len(mins) - 1)
+    hi = max(lo + 1, min(len(mins), -(-last // spb)))
+    mins = mins[lo:hi]
+    maxes = maxes[lo:hi]
+    if len(mins) <= width:
+        return mins, maxes
+    edges = np.linspace(0, len(mins), width, endpoint=False).astype(np.int64)
+    return np.minimum.reduceat(mins, edges), np.maximum.reduceat(maxes, edges)
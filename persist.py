@@ -0,0 +1,158 @@
+"""
+File: persist.py
+
+Description: Crash-safe file writes for PiSound's JSON files, with write counters.
+
+Files are never rewritten in place: the new contents go to a temporary file beside the target, which is flushed and
+fsync'd and then renamed over the target. A power cut on the Pi therefore leaves either the old or the new file, never
+a truncated one. Every write is counted and timed so the cost of persistence can be checked with write_stats().
+
+Journals are append-only files of one JSON record per line. The first line is a header naming the hash of the snapshot
+the journal applies to, so a journal left behind by an interrupted compaction (its records are already folded into the
+newer snapshot) is recognised and not replayed twice. A torn last line from a power cut is ignored.
+
+Writes that are due at a certain time (debounced saves, periodic snapshots) are handed to write_later() by their
+scheduler callbacks, and made one at a time on a writer thread: an fsync on an SD card can take longer than a short
+clip, and the scheduler thread must never wait for one.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+
+lock = threading.Lock()
+writes = 0                  # Writes actually made (whole files and journal appends)
+requests = 0                # Writes asked for (see backend.update_json, several requests coalesce into one write)
+bytes_written = 0
+total_time = 0.0
+last_time = 0.0
+max_time = 0.0
+write_queue = queue.Queue()
+writer = None
+
+
+def fsync_dir(path: str):
+    if os.name != "posix":      # Directories cannot be opened (or fsync'd) on Windows
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def count_write(size: int, took: float):
+    global writes, bytes_written, total_time, last_time, max_time
+
+    with lock:
+        writes += 1
+        bytes_written += size
+        total_time += took
+        last_time = took
+        max_time = max(max_time, took)
+
+
+def atomic_write(path: str, data: str | bytes):
+    """Replaces the contents of path with data (text or binary) atomically."""
+    begin = time.perf_counter()
+    tmp = path + ".tmp"
+    with open(tmp, "wb" if isinstance(data, bytes) else "w") as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp, path)
+    fsync_dir(path)
+    took = time.perf_counter() - begin
+
+    count_write(len(data), took)
+
+
+def writer_loop():
+    while True:
+        funct = write_queue.get()
+        try:
+            funct()
+        except Exception:       # Such as a full disk, the writes after it are still made
+            print("PiSound writer: write failed")
+            traceback.print_exc()
+        finally:
+            write_queue.task_done()
+
+
+def write_later(funct):
+    """Runs funct (which writes to disk) on the writer thread, after the writes queued before it. Returns at once."""
+    global writer
+
+    if writer is None:
+        writer = threading.Thread(target=writer_loop, name="PiSound writer", daemon=True)
+        writer.start()
+    write_queue.put(funct)
+
+
+def write_wait():
+    """Waits until every write queued so far is made."""
+    write_queue.join()
+
+
+def snapshot_hash(data: bytes):
+    return hashlib.sha1(data).hexdigest()
+
+
+def journal_reset(path: str, snapshot: str):
+    """Atomically starts an empty journal for the snapshot with hash snapshot."""
+    atomic_write(path, json.dumps({"snapshot": snapshot}) + "\n")
+
+
+def journal_append(path: str, record: dict):
+    """Appends record to the journal at path and returns the journal's new size in bytes."""
+    begin = time.perf_counter()
+    line = json.dumps(record) + "\n"
+    with open(path, "a") as fp:
+        fp.write(line)
+        fp.flush()
+        os.fsync(fp.fileno())
+        size = fp.tell()
+    took = time.perf_counter() - begin
+
+    count_write(len(line), took)
+    return size
+
+
+def journal_read(path: str):
+    """Returns the header and the records of the journal at path, or (None, []) if there is no readable journal."""
+    try:
+        with open(path, "r") as fp:
+            lines = fp.read().split("\n")
+    except OSError:
+        return None, []
+
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return None, []
+    records = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:          # Torn write, nothing after it was committed
+            break
+    return header, records
+
+
+def count_request():
+    global requests
+
+    with lock:
+        requests += 1
+
+
+def write_stats():
+    with lock:
+        return {"requests": requests, "writes": writes, "bytes": bytes_written, "total_ms": total_time * 1000,
+                "last_ms": last_time * 1000, "max_ms": max_time * 1000,
+                "mean_ms": total_time * 1000 / writes if writes else 0.0}
@@ -10,151 +10,165 @@ This program implements a more refined GUI of PiSound, leveraging methods from b
 various elements that will be detailed here. At the top of the window is the mode bar, which will change depending on
 the mode the program is in as well as give access to switching the modes, adding sounds, and quiting the program.
 The rest (and majority) of the window is made of the Slots grid. Each slot can be filled by a sound, which will be used
-for playing the sound, selecting for edit and movement, and deletion of the sound. There are three major "mode"
-screens: Play Mode (Main Menu), Edit Mode, and Trash Mode.
+for playing the sound, selecting for edit and movement, and deletion of the sound. The board has as many pages (banks)
+of slots as needed, flipped through with the arrows beside the title; the same slot widgets are reused for every page.
+There are three major "mode" screens: Play Mode (Main Menu), Edit Mode, and Trash Mode.
 
 From Play Mode, a selected slot will play the associated sound. Clicking the slot again will stop the sound if it is
-still playing, and clicking another slot will interrupt and play its own sound (functionality of pressing the same slot
-while it is playing is subject to change and most likely will eventually become a selectable mode feature). From Play
-Mode, you may access the Add Sound function and Edit Mode.
+still playing, and clicking another slot will play its own sound on top of it (sounds are played by the polyphonic
+engine, see engine.py, so several slots can sound at once). From Play Mode, you may access the Add Sound function and
+Edit Mode.
+
+Nothing is created at import: the Tk root and its variables are made by run(), which starts the backend in fast-start
+mode (the audio device opens in the background, see backend.py) so the grid is shown as soon as the profile is read.
 """
 from typing import Callable
 import tkinter as tk
 import tkinter.ttk as ttk
-import os
 import platform
-from backend import *
-
-num_slots_w = 7
-num_slots_h = 4
+import time
+from peaks import peaks_request, peaks_view
+from metaindex import meta_cached
+from backend import SoundEntry, audio_busy, back_init, bank_pin, bank_prefetch, board_cols, board_rows, cmd_prmpt_off, \
+    engine_meters, entry_clips, fast_start_on, flush_json, get_by_coord, lazy_load_on, library_list, library_ready, \
+    page_count, startup_phase, startup_report, trim_key
+from cmdqueue import drain, post, wait_idle
+from metrics import timed
+
+num_slots_w = board_cols
+num_slots_h = board_rows
 window_w = 800
 window_h = 480
-root = tk.Tk()
+wave_w = int(window_w / 1.5) - 20   # Waveform canvas of the Add/Edit window
+wave_h = 60
+min_clip = 0.01             # Seconds the start and end markers are kept apart
+tick_fps = 60               # Backend events drained per second while commands or sounds are in flight (see tick())
+meter_fps = 10              # Playback position/level display updates per second
+tick_after = None           # Pending Tk after() of tick(), None when idle
+in_flight = 0               # Commands posted to the backend worker and not answered yet
+playing = 0                 # Voices started whose "finished" event has not come yet
+last_meter = 0.0
+metered: set = set()        # Slots showing a meter
+root: tk.Tk = None
 mode_text = ttk.Label
-mode = tk.StringVar(master=root, value="Play Mode")
+mode: tk.StringVar = None
+page_text: tk.StringVar = None
+curr_mode = "play"
+curr_page = 0
 
-curr_timer = threading.Timer
+
+def same_command(a: tuple, b: tuple):
+    """Compares two (function, args) button commands. Args are compared by identity, since they are usually widgets or
+    profile dicts that would be slow (and wrong) to compare by value."""
+    if a is None or b is None:
+        return a is b
+    return a[0] == b[0] and len(a[1]) == len(b[1]) and all(x is y for x, y in zip(a[1], b[1]))
 
 
 class Slot:
     is_playing = False
     is_sound = False
     pos = -1
-    timer = threading.Timer
+    voice = None
     button = None
     x = -1
     y = -1
-    dur = tk.DoubleVar(value=0.0)
-    dur_timer = None
-    timer_run = False
-    this_profile: dict
+    dur: tk.DoubleVar = None    # Playback position in seconds, updated by publish_meters()
+    pending = False             # A play was posted and has not started yet
+    this_profile: SoundEntry
+    rendered: dict
 
     def __init__(self, x, y, pos, profile):
         self.pos = pos
+        self.rendered = {"text": "", "command": None, "state": "normal"}
+        self.dur = tk.DoubleVar(master=root, value=0.0)
         if self.pos == -1:  # "=Add Sound=" button (no edit mode on SoundWindow)
             self.button = ttk.Button(master=root, text="=Add Sound=", compound="center",
                                      command=lambda: SoundWindow(self, False))
+            self.rendered.update(text="=Add Sound=", command=(SoundWindow, (self, False)))
             self.is_sound = False
         elif self.pos < -1:  # Menu button (changes to play (-2), edit(-3), or trash (-4) mode)
             self.update_menu_button()
         else:  # Play button (connects to a profile and plays a sound when pressed)
-            self.button = ttk.Button(master=root, text=profile[self.pos]["text"], compound="center",
+            self.button = ttk.Button(master=root, text=profile[self.pos].text, compound="center",
                                      command=self.play_stop)
+            self.rendered.update(text=profile[self.pos].text, command=(self.play_stop, ()))
             self.is_sound = True
             self.this_profile = profile[pos]
         self.button.grid(row=(y + 1), column=x, sticky="nsew", padx=5, pady=5)
         self.x = x
         self.y = y
-        self.timer = threading.Timer(0.0, self.play_stop)
-
-    def timer_update(self, timer: threading.Timer):
-        while self.timer_run:
-            self.dur.set(round(self.dur.get() + 0.1, 1))
-            if timer.finished.is_set():
-                self.timer_run = False
-            time.sleep(0.1)
-
-    def timer_init(self):
-        self.dur_timer = threading.Thread(target=self.timer_update, args=(curr_timer,))
-        self.dur_timer.daemon = True
-
-    def update_play_button(self):
-        # self.button.destroy()
-        # self.button = ttk.Button(master=root, text=profile[self.pos]["text"], compound="center",
-        #                          command=lambda: self.play_stop(profile))
-        self.button.config(text=self.this_profile["text"], command=self.play_stop)
-        # self.button.grid(row=(self.y + 1), column=self.x, sticky="nsew", padx=5, pady=5)
-        self.is_sound = True
+
+    def show_meter(self, position: float = None, level: float = None):
+        """Shows the playback position (and level bar, if known) of this slot's voice. None once it stopped."""
+        if position is None:
+            if self.pos >= 0:
+                self.render(text=self.this_profile.text)
+            return
+        self.dur.set(round(position, 1))
+        if self.pos >= 0 and curr_mode == "play":
+            bar = "" if level is None else "|" * round(level * 8)
+            self.render(text=f"{self.this_profile.text}\n{position:.1f} s {bar}")
+
+    def render(self, text: str = None, command: tuple = None, state: str = None):
+        """Pushes only the button options that changed since the last render to Tk, in a single config call.
+        command is a (function, args) pair; it counts as changed unless it is the same function with the same args."""
+        changed = {}
+        if text is not None and text != self.rendered["text"]:
+            changed["text"] = text
+        if command is not None and not same_command(command, self.rendered["command"]):
+            self.rendered["command"] = command
+            funct, args = command
+            changed["command"] = lambda: funct(*args)
+        if state is not None and state != self.rendered["state"]:
+            changed["state"] = state
+        if changed:
+            self.rendered.update((k, v) for k, v in changed.items() if k != "command")
+            self.button.config(**changed)
+
+    def bind(self, sel: SoundEntry = None):
+        """Rebinds this (recycled) slot to the profile sound sel, or makes it an empty "=Add Sound=" slot if sel is
+        None. Only the binding changes, the button itself is updated by the next render."""
+        new_pos = -1 if sel is None else sel.id
+        if new_pos != self.pos:     # A voice still playing (or starting) keeps playing, just not as this slot's
+            self.voice = None
+            self.pending = False
+            self.is_playing = False
+        self.pos = new_pos
+        self.is_sound = sel is not None
+        if sel is not None:
+            self.this_profile = sel
 
     def update_menu_button(self, new_pos=None):
         if new_pos is not None:
             self.pos = new_pos
 
         if self.button is None:  # No button init yet
-            match self.pos:
-                case -2:
-                    self.button = ttk.Button(master=root, text="Play Mode", compound="center",
-                                             command=lambda: play_populate())
-                case -3:
-                    self.button = ttk.Button(master=root, text="Edit Mode", compound="center",
-                                             command=lambda: edit_populate())
-                case -4:
-                    self.button = ttk.Button(master=root, text="Trash Mode", compound="center",
-                                             command=lambda: play_populate())
-        else:
-            match self.pos:
-                case -2:
-                    self.button.config(text="Play Mode", command=lambda: play_populate())
-                case -3:
-                    self.button.config(text="Edit Mode", command=lambda: edit_populate())
-                case -4:
-                    self.button.config(text="Trash Mode", command=lambda: play_populate())
+            self.button = ttk.Button(master=root, compound="center")
+        match self.pos:
+            case -2:
+                self.render(text="Play Mode", command=(play_populate, ()))
+            case -3:
+                self.render(text="Edit Mode", command=(edit_populate, ()))
+            case -4:
+                self.render(text="Trash Mode", command=(play_populate, ()))
 
     def manual_update_button(self, text: str="", funct: Callable=None, state="", args=()):
-        if text != "":
-            self.button.config(text=text)
-        if funct is not None:
-            self.button.config(command=lambda: funct(*args))
-        if state != "":
-            self.button.config(state=state)
-
-    def play_stop(self, test_profile: dict = None):
-        global curr_timer
+        self.render(text=text or None, command=None if funct is None else (funct, args), state=state or None)
 
-        if not self.is_sound:
+    def play_stop(self, test_profile: SoundEntry = None):
+        if not self.is_sound or self.pending:
             return
 
-        if self.pos == -1:
-            if not self.is_playing:
-                if test_profile is None:
-                    self.timer = play_sound(self.this_profile)
-                else:
-                    self.timer = play_sound(test_profile)
-                curr_timer = self.timer
-                self.dur.set(0)
-                self.timer_init()
-                self.timer_run = True
-                self.dur_timer.start()
-            else:
-                stop_sound(curr_timer)
-                self.timer_run = False
-            self.is_playing = not self.is_playing
-            return
-
-        if not self.is_playing:
-            switch_sounds()
-            if test_profile is None:
-                self.timer = play_sound(self.this_profile)
-            else:
-                self.timer = play_sound(test_profile)
-            curr_timer = self.timer
+        if self.voice is None or not self.voice.is_alive():
+            self.pending = True
+            send("play", self.this_profile if test_profile is None else test_profile, slot=self)
         else:
-            stop_sound(curr_timer)
-        self.is_playing = not self.is_playing
+            send("stop", self.voice, slot=self)
 
     def stop(self):
-        if self.timer.is_alive():
-            self.timer.cancel()
+        if self.voice is not None:
+            send("stop", self.voice, slot=self)
         self.is_playing = False
 
 
@@ -164,16 +178,32 @@ class SoundWindow:
     padding = 2
     sound = tk.Listbox
     img = tk.Listbox
+    soundopts = tk.Variable
+    imgopts = tk.Variable
+    search = tk.StringVar
     text = tk.StringVar
     vol = tk.IntVar
     start = tk.DoubleVar
     end = tk.DoubleVar
+    length = tk.StringVar
+    wave = tk.Canvas
+    wave_len = 0.0
+    wave_future = None
+    sid = -1                    # Sound edited, and the board position saved to, as they were when the window opened
+    page = 0
+    row = -1
+    col = -1
+    chain: list[SoundEntry]
+    chain_text = tk.StringVar
+    loop = tk.BooleanVar
 
     def __init__(self, slot: Slot, edit_mode: bool):
         self.a_s_menu = tk.Toplevel(master=root)
         self.change_slot = slot
+        # The slot widget is recycled when the page is flipped, so what it points at now is what gets saved
+        self.sid, self.page, self.row, self.col = slot.pos, curr_page, slot.y, slot.x
         self.change_slot.is_sound = True  # Temporarily is_sound = True to allow for test-playing
-        self.a_s_menu.geometry(f"{int(window_w / 1.5)}x{int(window_h / 1.25)}")
+        self.a_s_menu.geometry(f"{int(window_w / 1.5)}x{int(window_h / 1.05)}")
         if edit_mode:
             self.a_s_menu.title("Edit Sound")
         else:
@@ -196,34 +226,39 @@ class SoundWindow:
         # Options frame (gridded)(Sound Sel, Image Sel, Name Set)
         opts_frm = ttk.Frame(master=self.a_s_menu)
         ttk.Label(master=opts_frm, text="Sound File Select:", justify="center").grid(row=0, column=0)
-        soundopts = tk.Variable(master=opts_frm, value=os.listdir(os.path.join("sounds")))
+        self.soundopts = tk.Variable(master=opts_frm, value=library_list("sounds"))
         self.sound = tk.Listbox(master=opts_frm, activestyle="dotbox", selectmode="single",
-                                listvariable=soundopts, height=3)
+                                listvariable=self.soundopts, height=3)
         self.sound.grid(row=0, column=1, padx=self.padding, pady=self.padding)
+        self.length = tk.StringVar(master=opts_frm, value="")
+        ttk.Label(master=opts_frm, textvariable=self.length, justify="center").grid(row=0, column=2)
+        self.sound.bind("<<ListboxSelect>>", lambda event: self.show_length())
         # Edit mode re-selects correct sound option
         if edit_mode:
-            options = soundopts.get()
-            ind = options.index(slot.this_profile["sound"])
-            if ind >= 0:
-                self.sound.selection_set(ind)
+            self.select_sound(slot.this_profile.sound)      # Length and waveform are shown once the canvas exists
         ttk.Label(master=opts_frm, text="Image File Select (optional):", justify="center").grid(row=1, column=0)
-        imgopts = tk.Variable(master=opts_frm, value=os.listdir(os.path.join("imgs")))
+        self.imgopts = tk.Variable(master=opts_frm, value=library_list("imgs"))
         self.img = tk.Listbox(master=opts_frm, activestyle="dotbox", selectmode="single",
-                              listvariable=imgopts, height=3)
+                              listvariable=self.imgopts, height=3)
         self.img.grid(row=1, column=1, padx=self.padding, pady=self.padding)
         # Edit mode re-selects correct image option (NOT YET IMPLEMENTED)
         # if edit_mode:
         #     options = imgopts.get()
-        #     ind = options.index(slot.this_profile["img"])
+        #     ind = options.index(slot.this_profile.img)
         #     if ind >= 0:
         #         self.img.selection_set(ind)
         ttk.Label(master=opts_frm, text="Set Sound Name:", justify="center").grid(row=2, column=0)
         self.text = tk.StringVar(master=opts_frm, name="Sound Name")
         # Edit mode resets to correct name
         if edit_mode:
-            self.text.set(slot.this_profile["text"])
+            self.text.set(slot.this_profile.text)
         ttk.Entry(master=opts_frm, justify="left", textvariable=self.text).grid(row=2, column=1, padx=self.padding,
                                                                                 pady=self.padding)
+        ttk.Label(master=opts_frm, text="Search Sounds:", justify="center").grid(row=3, column=0)
+        self.search = tk.StringVar(master=opts_frm, value="")
+        self.search.trace_add("write", lambda *args: self.soundopts.set(library_list("sounds", self.search.get())))
+        ttk.Entry(master=opts_frm, justify="left", textvariable=self.search).grid(row=3, column=1, padx=self.padding,
+                                                                                  pady=self.padding)
         opts_frm.pack()
 
         # Volume Set (packed)
@@ -233,7 +268,7 @@ class SoundWindow:
                                                                                                   pady=self.padding)
         self.vol.set(25)
         if edit_mode:
-            self.vol.set(int(float(slot.this_profile["volume"]) * 100))
+            self.vol.set(int(slot.this_profile.volume * 100))
 
         # Bounds Frame (gridded)(Start Set, End Set)
         bound_frm = ttk.Frame(master=self.a_s_menu)
@@ -241,8 +276,8 @@ class SoundWindow:
         self.start = tk.DoubleVar(master=self.a_s_menu, value=0.0)
         self.end = tk.DoubleVar(master=self.a_s_menu, value=0.0)
         if edit_mode:
-            self.start.set(slot.this_profile["start"])
-            self.end.set(slot.this_profile["end"])
+            self.start.set(slot.this_profile.start)
+            self.end.set(slot.this_profile.end)
         ttk.Label(master=bound_frm, text="Set Start Second Value:", justify="right").grid(row=0, column=0)
         ttk.Label(master=bound_frm, text="Set End Second Value:", justify="right").grid(row=1, column=0)
         ttk.Entry(master=bound_frm, textvariable=self.start).grid(row=0, column=1)
@@ -250,11 +285,38 @@ class SoundWindow:
                   validatecommand=(valid_end, "%P")).grid(row=1, column=1)
         bound_frm.pack()
 
+        # Waveform with start (green) and end (red) markers, drag them to set the bounds
+        self.wave = tk.Canvas(master=self.a_s_menu, width=wave_w, height=wave_h, background="black",
+                              highlightthickness=0)
+        self.wave.pack(padx=self.padding, pady=self.padding)
+        self.wave.bind("<Button-1>", self.drag_marker)
+        self.wave.bind("<B1-Motion>", self.drag_marker)
+        self.start.trace_add("write", lambda *args: self.draw_markers())
+        self.end.trace_add("write", lambda *args: self.draw_markers())
+        if edit_mode:
+            self.show_length()
+        if not library_ready():         # Opened before the library's first scan is done
+            self.a_s_menu.after(100, self.refresh_lists, slot.this_profile.sound if edit_mode else "")
+
+        # Chain Frame (gridded): clips played gaplessly after this sound, built from the selection and bounds above
+        chain_frm = ttk.Frame(master=self.a_s_menu)
+        self.chain = list(slot.this_profile.chain) if edit_mode else []
+        self.chain_text = tk.StringVar(master=self.a_s_menu, value="")
+        self.loop = tk.BooleanVar(master=self.a_s_menu, value=edit_mode and slot.this_profile.loop)
+        ttk.Label(master=chain_frm, text="Then Play:", justify="right").grid(row=0, column=0)
+        ttk.Label(master=chain_frm, textvariable=self.chain_text, width=30).grid(row=0, column=1)
+        ttk.Button(master=chain_frm, text="Append Selected", command=self.chain_append).grid(row=0, column=2)
+        ttk.Button(master=chain_frm, text="Clear", command=self.chain_clear).grid(row=0, column=3)
+        ttk.Checkbutton(master=chain_frm, text="Loop", variable=self.loop).grid(row=0, column=4)
+        chain_frm.pack()
+        self.show_chain()
+
         ttk.Button(master=self.a_s_menu, text="Test Play/Stop Sound", command=self.test_play).pack()
         ttk.Label(master=self.a_s_menu, textvariable=self.change_slot.dur).pack()
 
     def discard(self):
         self.change_slot.is_sound = False
+        populate()
         self.a_s_menu.destroy()
 
     def save(self, edit_mode):
@@ -263,39 +325,148 @@ class SoundWindow:
         except tk.TclError:
             self.a_s_menu.destroy()
             return
-        if edit_mode:
-            edit_sound(self.change_slot.pos, sound=file, text=self.text.get(), vol=self.vol.get(),
-                       start=self.start.get(), end=self.end.get(), row=self.change_slot.y, col=self.change_slot.x)
+        if edit_mode:   # The board is repopulated once the backend worker has saved it (see tick())
+            send("edit", self.sid, sound=file, text=self.text.get(), vol=self.vol.get(), start=self.start.get(),
+                 end=self.end.get(), row=self.row, col=self.col, page=self.page, chain=self.chain,
+                 loop=self.loop.get())
         else:
-            self.change_slot.pos, profile = add_sound(sound=file, text=self.text.get(), vol=self.vol.get(),
-                                                      start=self.start.get(), end=self.end.get(),
-                                                      row=self.change_slot.y, col=self.change_slot.x)
-        self.change_slot.update_play_button()
+            send("add", sound=file, text=self.text.get(), vol=self.vol.get(), start=self.start.get(),
+                 end=self.end.get(), row=self.row, col=self.col, page=self.page, chain=self.chain,
+                 loop=self.loop.get())
         self.a_s_menu.destroy()
 
     def test_play(self):  # Fix to match same function as start/stop of normal slots
         try:
-            test_profile = {"sound": self.sound.selection_get(), "text": self.text.get(),
-                             "img": self.img.selection_get(), "volume": self.vol.get() / 100, "start": self.start.get(),
-                             "end": self.end.get(), "row": -1, "col": -1}
+            test_profile = SoundEntry(sound=self.sound.selection_get(), text=self.text.get(),
+                                      img=self.img.selection_get(), volume=self.vol.get() / 100,
+                                      start=self.start.get(), end=self.end.get(), chain=tuple(self.chain),
+                                      loop=self.loop.get())
         except tk.TclError:
             return
 
         self.change_slot.play_stop(test_profile=test_profile)
 
+    def chain_append(self):
+        """Adds the selected sound, with the start/end bounds set above, to the end of the chain."""
+        try:
+            clip = SoundEntry(sound=self.sound.selection_get(), start=self.start.get(), end=self.end.get())
+        except tk.TclError:
+            return
+        self.chain.append(clip)
+        self.show_chain()
+
+    def chain_clear(self):
+        self.chain = []
+        self.show_chain()
+
+    def show_chain(self):
+        names = [clip.sound if clip.start <= 0 and clip.end <= 0 else f"{clip.sound} ({clip.start:g}-{clip.end:g} s)"
+                 for clip in self.chain]
+        self.chain_text.set(", ".join(names) or "(nothing)")
+
+    def select_sound(self, name: str):
+        """Selects sound file name in the list, if it is listed."""
+        options = self.soundopts.get()
+        if name in options:
+            ind = options.index(name)
+            self.sound.selection_clear(0, "end")
+            self.sound.selection_set(ind)
+            self.sound.see(ind)
+
+    def refresh_lists(self, name: str):
+        """Lists the sounds and images again once the library's first scan is done (polled from the Tk loop), keeping
+        the picked sound selected. Until one is picked, sound file name is selected."""
+        if not self.a_s_menu.winfo_exists():
+            return
+        if not library_ready():
+            self.a_s_menu.after(100, self.refresh_lists, name)
+            return
+        picked = self.sound.curselection()
+        if picked:
+            name = self.sound.get(picked[0])
+        self.soundopts.set(library_list("sounds", self.search.get()))
+        if not self.img.curselection():
+            self.imgopts.set(library_list("imgs"))
+        self.select_sound(name)
+        if not picked and self.sound.curselection():
+            self.show_length()
+
+    def show_length(self):
+        """Shows the length of the selected sound as indexed by the library scanner (nothing is probed or decoded on
+        the Tk thread), or once its waveform is ready if it is not indexed yet."""
+        sel = self.sound.curselection()
+        if not sel:
+            return
+        meta = meta_cached(self.sound.get(sel[0]))
+        self.wave_len = meta["duration"] if meta is not None else 0.0
+        self.length.set(f"Length: {self.wave_len:.1f} s" if self.wave_len > 0 else "")
+        self.wave.delete("all")
+        self.wave.create_text(wave_w / 2, wave_h / 2, text="Loading waveform...", fill="grey", tags="wave")
+        self.wave_future = peaks_request(self.sound.get(sel[0]))
+        self.a_s_menu.after(50, self.draw_waveform, self.wave_future)
+        self.draw_markers()
+
+    def draw_waveform(self, future):
+        """Draws the peaks from future once they are ready (polled from the Tk loop, the peaks are worked out on a
+        background thread)."""
+        if future is not self.wave_future or not self.a_s_menu.winfo_exists():     # Other sound picked, or closed
+            return
+        if not future.done():
+            self.a_s_menu.after(50, self.draw_waveform, future)
+            return
+
+        self.wave.delete("wave")
+        pyramid = future.result()
+        if pyramid is None:
+            self.wave.create_text(wave_w / 2, wave_h / 2, text="No waveform", fill="grey", tags="wave")
+            return
+        mins, maxes = (values.tolist() for values in peaks_view(pyramid, wave_w))
+        step = wave_w / max(1, len(mins) - 1)
+        mid = wave_h / 2
+        points = [(i * step, mid - top * mid) for i, top in enumerate(maxes)]
+        points += [(i * step, mid - bottom * mid) for i, bottom in reversed(list(enumerate(mins)))]
+        self.wave.create_polygon(points, fill="green", outline="green", tags="wave")
+        if self.wave_len <= 0:
+            self.wave_len = pyramid["frames"] / pyramid["rate"]
+            self.length.set(f"Length: {self.wave_len:.1f} s")
+            self.draw_markers()
+        self.wave.tag_raise("marker")
+
+    def draw_markers(self):
+        self.wave.delete("marker")
+        if self.wave_len <= 0:
+            return
+        try:
+            start = self.start.get()
+            end = self.end.get() or self.wave_len
+        except tk.TclError:     # Half-typed number
+            return
+        for seconds, color in ((start, "lime"), (end, "red")):
+            x = min(max(seconds / self.wave_len, 0.0), 1.0) * (wave_w - 1)
+            self.wave.create_line(x, 0, x, wave_h, fill=color, width=2, tags="marker")
+
+    def drag_marker(self, event):
+        """Moves the start or end marker (whichever is nearer) to the pointer, keeping some sound between them."""
+        if self.wave_len <= 0:
+            return
+        seconds = round(min(max(event.x / (wave_w - 1), 0.0), 1.0) * self.wave_len, 2)
+        try:
+            start = self.start.get()
+            end = self.end.get() or self.wave_len
+        except tk.TclError:
+            return
+        if abs(seconds - start) <= abs(seconds - end):
+            self.start.set(max(0.0, min(seconds, round(end - min_clip, 2))))
+        else:
+            self.end.set(min(self.wave_len, max(seconds, round(start + min_clip, 2))))
+
     def validate_end(self, num: str):
         if num == "":
             return True
         decim = num.find(".")
         if (num[0: decim].isdigit() or 0 == decim) and (
                 num[decim + 1:].isdigit() or len(num) - 1 == decim) or num.isdigit():
-            try:
-                if float(num) > update_bounds(os.path.join("sounds", self.sound.selection_get())):
-                    return False
-                else:
-                    return True
-            except tk.TclError:
-                return False
+            return self.wave_len <= 0 or float(num) <= self.wave_len     # Unknown lengths are checked on play
         else:
             return False
 
@@ -305,17 +476,29 @@ slot_collection = [[Slot for i in range(num_slots_h)] for j in range(num_slots_w
 menu_slots: list[Slot] = []
 
 
+def pin_visible():
+    bank_pin(trim_key(clip) for i in slot_collection for j in i if j.pos >= 0 for clip in entry_clips(j.this_profile))
+
+
+def page_sounds(page: int):
+    return [sel for i in range(num_slots_w) for j in range(num_slots_h) if (sel := get_by_coord(j, i, page))]
+
+
 def switch_sounds():
     for i in slot_collection:
         for j in i:
             if j is not None:
                 j.stop()
+    send("stop")                # Also stops sounds started from other pages
 
 
 def init():
-    global root
+    global root, mode, page_text
 
     cmd_prmpt_off()
+    root = tk.Tk()
+    mode = tk.StringVar(master=root, value="Play Mode")
+    page_text = tk.StringVar(master=root, value="Page 1")
     root.title("PiSound")
 
     # root.iconphoto()
@@ -332,9 +515,16 @@ def init():
     for i in range(num_slots_w):
         root.columnconfigure(i, weight=1, minsize=100)
 
+    prev_button = ttk.Button(master=root, text="<", command=lambda: show_page(curr_page - 1))
+    prev_button.grid(row=0, column=int(num_slots_w/2) - 1, sticky="nsew")
     title = ttk.Label(master=root, text="PiSound", background="grey", anchor="center", justify="center",
-                      font="-family Courier -size 32 -weight bold")
-    title.grid(row=0, column=int(num_slots_w/2) - 1, columnspan=3, sticky="nsew")
+                      font="-family Courier -size 20 -weight bold")
+    title.grid(row=0, column=int(num_slots_w/2), sticky="new")
+    page_label = ttk.Label(master=root, textvariable=page_text, background="grey", anchor="center",
+                           justify="center", font="-family Courier -size 12 -weight bold")
+    page_label.grid(row=0, column=int(num_slots_w/2), sticky="sew")
+    next_button = ttk.Button(master=root, text=">", command=lambda: show_page(curr_page + 1))
+    next_button.grid(row=0, column=int(num_slots_w/2) + 1, sticky="nsew")
     mode_type = ttk.Label(master=root, textvariable=mode, foreground="green", anchor="center", justify="center",
                           font="-family Courier -size 14 -weight bold")
     mode_type.grid(row=0, column=1, sticky="nsew")
@@ -345,76 +535,141 @@ def init():
     return mode_type
 
 
+@timed
 def init_populate():
-    profile = get_profile()
-    num_item = 0
-    coords = []
-    #x = 0
-    #y = 1
-    if profile:
-        for i in profile:
-            coords.append([i["col"], i["row"]])
-            new_slot = Slot(coords[num_item][0], coords[num_item][1], num_item, profile)
-            slot_collection[coords[num_item][0]][coords[num_item][1]] = new_slot
-            num_item = num_item + 1
-            # x = x + 1
-            # if x >= num_slots_w:
-            #     x = 0
-            #     y = y + 1
-
+    # The slot widgets are a fixed pool, pages only rebind them to other sounds (see populate())
     for i in range(num_slots_w):
         for j in range(num_slots_h):
-            if [i, j] not in coords:
-                new_slot = Slot(i, j, -1, profile)
-                slot_collection[i][j] = new_slot
+            slot_collection[i][j] = Slot(i, j, -1, None)
 
-    new_slot = Slot(num_slots_w - 2, -1, -3, profile) # Set Edit Mode button
+    new_slot = Slot(num_slots_w - 2, -1, -3, None) # Set Edit Mode button
     menu_slots.append(new_slot)
-    new_slot = Slot(num_slots_w - 1, -1, -4, profile) # Set Trash Mode button
+    new_slot = Slot(num_slots_w - 1, -1, -4, None) # Set Trash Mode button
     menu_slots.append(new_slot)
 
+    populate()
 
-def play_populate():
-    profile = get_profile()
-    num_item = 0
-    coords = []
-    if profile:
-        for i in profile:
-            coords.append([i["col"], i["row"]])
-            new_slot = slot_collection[coords[num_item][0]][coords[num_item][1]]
-            new_slot.manual_update_button(text=i["text"], funct=new_slot.play_stop, state="normal",
-                                          args=(profile,))
-            num_item = num_item + 1
 
+@timed
+def populate():
+    """Binds every slot to the sound at its position on the current page and renders it for the current mode."""
     for i in range(num_slots_w):
         for j in range(num_slots_h):
-            if [i, j] not in coords:
-                new_slot = slot_collection[i][j]
-                new_slot.manual_update_button(state="normal")
+            sel = get_by_coord(j, i, curr_page)
+            new_slot = slot_collection[i][j]
+            new_slot.bind(sel)
+            if sel is not None and curr_mode == "edit":
+                new_slot.manual_update_button(text=sel.text, funct=SoundWindow, state="normal",
+                                              args=(new_slot, True))
+            elif sel is not None:
+                new_slot.manual_update_button(text=sel.text, funct=new_slot.play_stop, state="normal")
+            else:
+                new_slot.manual_update_button(text="=Add Sound=", funct=SoundWindow, args=(new_slot, False),
+                                              state="disabled" if curr_mode == "edit" else "normal")
+
+    page_text.set(f"Page {curr_page + 1}/{max(page_count(), curr_page + 1)}")
+    pin_visible()
+    bank_prefetch(page_sounds(curr_page) + page_sounds(curr_page + 1) + page_sounds(curr_page - 1))
+
+
+def send(name: str, *args, slot=None, **kwargs):
+    """Posts a backend command to the worker thread (see cmdqueue.py) and makes sure tick() is running to collect its
+    outcome."""
+    global in_flight
+
+    post(name, *args, slot=slot, **kwargs)
+    in_flight += 1
+    tick_start()
+
+
+def tick_start():
+    global tick_after
+
+    if tick_after is None:
+        tick_after = root.after(0, tick)
+
+
+@timed
+def tick():
+    """Applies the events reported by the backend worker and publishes the meters, on the Tk thread. A single callback
+    serves every slot; it runs tick_fps times a second while commands are in flight or voices are playing (until their
+    "finished" event is applied) and stops when idle."""
+    global tick_after, in_flight, playing, last_meter
+
+    for kind, name, slot, value in drain():
+        match kind:
+            case "started":
+                in_flight -= 1
+                playing += 1
+                if slot.pending:        # Otherwise the slot was rebound to another sound meanwhile
+                    slot.pending = False
+                    slot.voice = value
+                    slot.is_playing = True
+            case "finished":
+                playing -= 1
+                if slot is not None and slot.voice is value:
+                    slot.is_playing = False
+            case "done":
+                in_flight -= 1
+                if name in ("add", "edit", "delete"):
+                    populate()
+            case "errored":
+                in_flight -= 1
+                if slot is not None:
+                    slot.pending = False
+                print(f"PiSound: {name} failed: {value}")
+                root.bell()
+
+    now = time.perf_counter()
+    if now - last_meter >= 1 / meter_fps:
+        last_meter = now
+        publish_meters()
+    tick_after = root.after(int(1000 / tick_fps), tick) if in_flight > 0 or playing > 0 or metered else None
+
+
+def publish_meters():
+    """Shows the position and level of every playing voice on its slot."""
+    shown = set()
+    for voice, position, level in engine_meters():
+        slot = voice.slot
+        if slot is None or slot.voice is not voice:     # Slot rebound to another sound since
+            continue
+        slot.show_meter(position, level)
+        shown.add(slot)
+    for slot in metered - shown:
+        slot.show_meter()
+    metered.clear()
+    metered.update(shown)
+
+
+def show_page(page: int):
+    """Switches the board to page. Paging stops one page past the last page holding sounds (a fresh page to fill)."""
+    global curr_page
+
+    if page < 0 or page > page_count():
+        return
+    curr_page = page
+    populate()
+
+
+@timed
+def play_populate():
+    global curr_mode
 
+    curr_mode = "play"
+    populate()
     menu_slots[0].update_menu_button(new_pos=-3)
     menu_slots[1].update_menu_button(new_pos=-4)
     mode.set("Play Mode")
     mode_text.config(foreground="green")
 
 
+@timed
 def edit_populate():
-    profile = get_profile()
-    num_item = 0
-    coords = []
-    if profile:
-        for i in profile:
-            coords.append([i["col"], i["row"]])
-            new_slot = slot_collection[coords[num_item][0]][coords[num_item][1]]
-            new_slot.manual_update_button(funct=SoundWindow, args=(new_slot, True))
-            num_item = num_item + 1
-
-    for i in range(num_slots_w):
-        for j in range(num_slots_h):
-            if [i, j] not in coords:
-                new_slot = slot_collection[i][j]
-                new_slot.manual_update_button(state="disabled")
+    global curr_mode
 
+    curr_mode = "edit"
+    populate()
     menu_slots[0].update_menu_button(new_pos=-2)
     menu_slots[1].update_menu_button(new_pos=-4)
     mode.set("Edit Mode")
@@ -423,18 +678,33 @@ def edit_populate():
 
 def end_program():
     switch_sounds()
+    wait_idle()                 # Saves still queued for the backend worker must land before the final write
+    flush_json()
     root.destroy()
     exit()
 
 
+def report_startup():
+    """Prints the startup timing report once the audio has finished starting up in the background."""
+    if audio_busy():
+        root.after(100, report_startup)
+        return
+    print(startup_report())
+
+
 def run():
     global mode_text
 
-    back_init()
-    mode_text = init()
-
     cmd_prmpt_off()
-    init_populate()
+    lazy_load_on()
+    fast_start_on()
+    back_init()
+    with startup_phase("window"):
+        mode_text = init()
+    with startup_phase("grid"):
+        init_populate()
+        root.update_idletasks()     # First frame drawn
+    root.after(100, report_startup)
 
     root.mainloop()
 
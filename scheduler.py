@@ -0,0 +1,90 @@
+"""
+File: scheduler.py
+
+Description: Single-threaded, event-driven scheduler for everything PiSound has to do at a certain time.
+
+Every deadline (end of a voice, next duration counter tick, ...) goes into one priority queue served by one worker
+thread that sleeps until the earliest deadline. However fast the buttons are hit, PiSound runs exactly one scheduler
+thread.
+
+Callbacks run on the scheduler thread, so they must be short and must not block. A callback that raises is reported
+and skipped, the scheduler keeps running.
+"""
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+queue: list[list] = []              # Heap of [deadline, seq, callback] entries (callback None when cancelled)
+cond = threading.Condition()
+counter = itertools.count()
+worker = None
+
+
+def scheduler_loop():
+    while True:
+        with cond:
+            while not queue or queue[0][0] > time.perf_counter():
+                cond.wait(None if not queue else queue[0][0] - time.perf_counter())
+            entry = heapq.heappop(queue)
+        callback = entry[2]
+        if callback is None:
+            continue
+        try:
+            callback()
+        except Exception:       # One failing callback (a full disk on a save, say) must not stop every later one
+            print("PiSound scheduler: callback failed")
+            traceback.print_exc()
+
+
+def start():
+    global worker
+
+    with cond:
+        if worker is None:
+            worker = threading.Thread(target=scheduler_loop, name="PiSound scheduler", daemon=True)
+            worker.start()
+
+
+def schedule_at(deadline: float, callback):
+    """Runs callback at deadline (a time.perf_counter() value). Returns the entry to pass to cancel()."""
+    if worker is None:
+        start()
+    entry = [deadline, next(counter), callback]
+    with cond:
+        heapq.heappush(queue, entry)
+        if queue[0] is entry:
+            cond.notify()
+    return entry
+
+
+def schedule(delay: float, callback):
+    """Runs callback after delay seconds. Returns the entry to pass to cancel()."""
+    return schedule_at(time.perf_counter() + delay, callback)
+
+
+def every(interval: float, callback):
+    """Runs callback every interval seconds for as long as it returns True. Returns the handle to pass to cancel()."""
+    handle = [time.perf_counter() + interval, 0, callback]
+
+    def tick():
+        if handle[2] is not None and callback():
+            handle[0] += interval
+            schedule_at(handle[0], tick)
+
+    schedule_at(handle[0], tick)
+    return handle
+
+
+def cancel(entry):
+    """Cancels a scheduled callback. Cancelling an entry that already ran does nothing."""
+    if entry is None:
+        return
+    with cond:
+        entry[2] = None
+
+
+def pending():
+    with cond:
+        return sum(1 for entry in queue if entry[2] is not None)
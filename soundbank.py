@@ -0,0 +1,220 @@
+"""
+File: soundbank.py
+
+Description: Holds the sounds used by the profile as already decoded pygame.mixer.Sound objects so playback needs no
+disk I/O.
+
+The sound bank loads each file referenced by the profile once at back_init() (from the PCM cache, see pcmcache.py, so
+a file is only ever decoded once) and keeps the resulting mixer.Sound in memory, keyed by filename (the same "sound"
+value stored in profile.json). play_sound then only has to look up the buffer and play it. Sounds that are not in the
+bank yet (newly added through the GUI, for example) are loaded on first use and kept from then on.
+
+Decoded PCM is large (about 10 MB per minute of 44.1 kHz stereo), so the bank is bounded by a byte budget. Once the
+budget is hit the least recently played sounds are evicted, except for pinned sounds (the ones on the visible grid),
+which are never evicted. The hit/miss/eviction counters from bank_stats() can be used to size the budget.
+
+Profile entries with start/end bounds are stored already trimmed: the decoded samples between start and end are sliced
+out once into their own mixer.Sound (keyed by trim_key(), so the trimmed sound is rebuilt only when the bounds change).
+Playback then starts exactly at start and stops exactly at end with no seeking and no stop timers.
+
+bank_prefetch() decodes sounds ahead of time (the next board page, for example) on a single background thread, so they
+are already in the bank when they are first played.
+"""
+import os
+import queue
+import threading
+from collections import OrderedDict
+import pygame
+import pygame.mixer as mixer
+from engine import engine_wait
+from soundentry import entry_clips
+from pcmcache import cached_sound
+from metrics import timed
+
+sound_dir = "sounds"
+bank: OrderedDict[str, mixer.Sound] = OrderedDict()    # Least recently played first
+bank_sizes: dict[str, int] = {}
+pinned: set[str] = set()
+lock = threading.RLock()
+prefetch_queue = queue.Queue()
+prefetcher = None
+
+bank_budget = 64 * 1024 * 1024      # Bytes of decoded PCM to keep in memory
+bank_bytes = 0
+hits = 0
+misses = 0
+evictions = 0
+
+
+def bank_path(filename: str):
+    return os.path.join(sound_dir, filename)
+
+
+def sound_bytes(snd: mixer.Sound):
+    """Returns the size in bytes of the decoded PCM held by snd (sounds are always stored in the mixer's format)."""
+    freq, size, channels = mixer.get_init()
+    return round(snd.get_length() * freq) * channels * (abs(size) // 8)
+
+
+def bank_set_budget(budget: int):
+    global bank_budget
+
+    with lock:
+        bank_budget = budget
+        bank_evict()
+
+
+def bank_insert(filename: str, snd: mixer.Sound):
+    global bank_bytes
+
+    with lock:
+        bank_drop(filename)
+        bank[filename] = snd
+        bank_sizes[filename] = sound_bytes(snd)
+        bank_bytes += bank_sizes[filename]
+        bank_evict()
+
+
+def bank_evict():
+    """Evicts least recently played, unpinned sounds until the bank fits in its budget. Call with lock held."""
+    global bank_bytes, evictions
+
+    if bank_bytes <= bank_budget:
+        return
+    for filename in list(bank):
+        if bank_bytes <= bank_budget:
+            break
+        if filename in pinned:
+            continue
+        del bank[filename]
+        bank_bytes -= bank_sizes.pop(filename)
+        evictions += 1
+
+
+def bank_load(profile):
+    """Decodes the sounds referenced by the profile into the bank until the budget is full. Sounds placed on the grid
+    are loaded first, chained clips with the sound they follow. Files that fail to decode are skipped."""
+    for sel in (clip for sel in sorted(profile, key=lambda s: s.row < 0) for clip in entry_clips(sel)):
+        if bank_bytes >= bank_budget:
+            break
+        if trim_key(sel) in bank:
+            continue
+        try:
+            bank_get_trimmed(sel)
+        except (pygame.error, FileNotFoundError, ValueError):
+            continue
+
+
+def bank_lookup(key: str):
+    """Returns the cached sound for key (counting the hit or miss), or None."""
+    global hits, misses
+
+    with lock:
+        snd = bank.get(key)
+        if snd is None:
+            misses += 1
+        else:
+            hits += 1
+            bank.move_to_end(key)
+    return snd
+
+
+def bank_get(filename: str):
+    """Returns the decoded sound for filename, decoding (and caching) it first if it is not in the bank yet."""
+    snd = bank_lookup(filename)
+    if snd is None:
+        snd = cached_sound(bank_path(filename))
+        bank_insert(filename, snd)
+    return snd
+
+
+def trim_key(sel):
+    """Returns the bank key of the (possibly trimmed) sound played for profile entry sel."""
+    if sel.start <= 0 and sel.end <= 0:
+        return sel.sound
+    return f"{sel.sound}@{sel.start:g}-{sel.end:g}"
+
+
+def trim_sound(snd: mixer.Sound, start: float, end: float):
+    """Returns a new mixer.Sound holding only the samples of snd between start and end seconds (end <= 0 is the end of
+    the sound). Raises ValueError if the bounds leave no samples (the mixer cannot play an empty sound)."""
+    freq, size, channels = mixer.get_init()
+    frame = channels * (abs(size) // 8)
+    raw = snd.get_raw()
+    first = min(max(round(start * freq), 0) * frame, len(raw))
+    last = len(raw) if end <= 0 else min(round(end * freq) * frame, len(raw))
+    if last - first < frame:
+        raise ValueError(f"Bounds {start:g}-{end:g} s leave nothing of the sound")
+    return mixer.Sound(buffer=raw[first:last])
+
+
+@timed
+def bank_get_trimmed(sel):
+    """Returns the sound to play for profile entry sel, trimmed to its start/end bounds, slicing it first if needed."""
+    key = trim_key(sel)
+    if key == sel.sound:
+        return bank_get(key)
+
+    snd = bank_lookup(key)
+    if snd is None:
+        full = bank.get(sel.sound)
+        if full is None:            # Decode just for slicing, the untrimmed sound is not kept
+            full = cached_sound(bank_path(sel.sound))
+        snd = trim_sound(full, sel.start, sel.end)
+        bank_insert(key, snd)
+    return snd
+
+
+def prefetch_loop():
+    engine_wait()               # Nothing can be decoded before the mixer is open
+    while True:
+        sel = prefetch_queue.get()
+        if trim_key(sel) in bank:
+            continue
+        try:
+            bank_get_trimmed(sel)
+        except (pygame.error, FileNotFoundError, ValueError):
+            continue
+
+
+def bank_prefetch(sels):
+    """Queues the sounds for profile entries sels (and their chained clips) to be decoded into the bank in the
+    background."""
+    global prefetcher
+
+    if prefetcher is None:
+        prefetcher = threading.Thread(target=prefetch_loop, name="PiSound prefetch", daemon=True)
+        prefetcher.start()
+    for sel in sels:
+        for clip in entry_clips(sel):
+            prefetch_queue.put(clip)
+
+
+def bank_pin(filenames):
+    """Replaces the set of pinned sounds (never evicted) with filenames (bank keys, see trim_key())."""
+    with lock:
+        pinned.clear()
+        pinned.update(filenames)
+        bank_evict()
+
+
+def bank_drop(filename: str):
+    global bank_bytes
+
+    with lock:
+        if bank.pop(filename, None) is not None:
+            bank_bytes -= bank_sizes.pop(filename)
+
+
+def bank_clear():
+    global bank_bytes
+
+    with lock:
+        bank.clear()
+        bank_sizes.clear()
+        bank_bytes = 0
+
+
+def bank_stats():
+    return {"hits": hits, "misses": misses, "evictions": evictions, "entries": len(bank), "bytes": bank_bytes,
+            "budget": bank_budget, "pinned": len(pinned)}
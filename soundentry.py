@@ -0,0 +1,103 @@
+"""
+File: soundentry.py
+
+Description: Typed profile entries, validated and converted once when the profile is loaded.
+
+profile.json is a list of plain dicts (see the format notes in backend.py). entry_from_dict() checks and converts each
+entry once into a SoundEntry, a compact slotted dataclass, so a bad value is reported when the profile is loaded rather
+than when the sound is played, and entry_to_dict() turns it back into the profile.json format.
+
+An entry can hold a chain: clips played one after another (gaplessly, see engine.py) after its own sound, optionally
+looping back to the first. In profile.json that is
+    "chain": [{"sound": "drop.mp3", "start": 0.0, "end": 1.5}, ...], "loop": true
+and each clip becomes a SoundEntry of its own, of which only sound, start and end are used.
+
+JSON is read and written with orjson when it is installed (several times faster for big profiles), falling back to the
+standard json module otherwise.
+"""
+import json
+from dataclasses import dataclass
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@dataclass(slots=True)
+class SoundEntry:
+    sound: str
+    text: str = ""
+    volume: float = 0.25
+    start: float = 0.0
+    end: float = 0.0
+    row: int = -1
+    col: int = -1
+    page: int = 0
+    img: str = ""
+    id: int = -1            # -1 until the profile gives the entry its id
+    chain: tuple = ()       # Clips (SoundEntry) played after this sound, in order
+    loop: bool = False      # After the last clip, start over from this sound
+
+
+def entry_clips(sel: SoundEntry):
+    """Returns every clip sel plays, in order: its own sound first, then its chain."""
+    return (sel,) + sel.chain
+
+
+def clip_from_dict(raw: dict):
+    """Converts a "chain" clip of a profile.json entry into a SoundEntry. Raises ValueError for invalid clips."""
+    if not isinstance(raw, dict):
+        raise ValueError(f"Invalid chain clip {raw!r}")
+    return entry_from_dict({"sound": raw.get("sound", ""), "start": raw.get("start", 0.0), "end": raw.get("end", 0.0)})
+
+
+def entry_from_dict(raw: dict):
+    """Validates a profile.json entry and converts it into a SoundEntry. Raises ValueError for invalid entries."""
+    try:
+        sel = SoundEntry(sound=str(raw["sound"]), text=str(raw.get("text", "")), volume=float(raw.get("volume", 0.25)),
+                         start=float(raw.get("start", 0.0)), end=float(raw.get("end", 0.0)),
+                         row=int(raw.get("row", -1)), col=int(raw.get("col", -1)), page=int(raw.get("page", 0)),
+                         img=str(raw.get("img") or ""), id=int(raw.get("id", -1)),
+                         chain=tuple(clip_from_dict(clip) for clip in raw.get("chain") or ()),
+                         loop=bool(raw.get("loop", False)))
+    except (KeyError, TypeError, ValueError) as err:
+        raise ValueError(f"Invalid profile entry {raw!r}: {err!r}")
+
+    if sel.sound == "":
+        raise ValueError(f"Invalid profile entry {raw!r}: no sound file")
+    if not 0.0 <= sel.volume <= 1.0:
+        raise ValueError(f"Invalid profile entry {raw!r}: volume out of range")
+    if sel.start < 0 or sel.end < 0 or (sel.end > 0 and sel.end <= sel.start):
+        raise ValueError(f"Invalid profile entry {raw!r}: bad start/end bounds")
+    return sel
+
+
+def entry_check(sel: SoundEntry):
+    """Validates sel as entry_from_dict() would once it is saved, returning the checked copy. Raises ValueError for
+    invalid entries."""
+    return entry_from_dict(entry_to_dict(sel))
+
+
+def entry_to_dict(sel: SoundEntry):
+    raw = {"id": sel.id, "sound": sel.sound, "text": sel.text, "volume": sel.volume, "start": sel.start,
+           "end": sel.end, "row": sel.row, "col": sel.col, "page": sel.page}
+    if sel.img:
+        raw["img"] = sel.img
+    if sel.chain:
+        raw["chain"] = [{"sound": clip.sound, "start": clip.start, "end": clip.end} for clip in sel.chain]
+    if sel.loop:
+        raw["loop"] = True
+    return raw
+
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")      # No sound card needed
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame.mixer as mixer    # noqa: E402 (after the environment above)
+
+
+@pytest.fixture
+def mixer_on():
+    mixer.init(frequency=44100, size=-16, channels=2)
+    yield
+    mixer.quit()
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+import pytest
+import backend
+import persist
+from persist import journal_append, journal_read, journal_reset, snapshot_hash, write_stats, write_wait
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An empty profile in journal mode, in a fresh folder."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backend, "run_in_cmd", False)
+    monkeypatch.setattr(backend, "storage_mode", "journal")
+    backend.set_profile([])
+    journal_reset(backend.journal_file, snapshot_hash(b""))
+    return tmp_path
+
+
+def test_journal_replay(store):
+    first, _ = backend.add_sound("a.wav", "A", row=0, col=0)
+    second, _ = backend.add_sound("b.wav", "B", vol=80, row=0, col=1)
+    backend.edit_sound(first, text="A2", start=1, end=2)
+    backend.delete_sound(second)
+    expected = backend.profile_json()
+
+    header, records = journal_read(backend.journal_file)
+    assert header == {"snapshot": snapshot_hash(b"")}
+    backend.set_profile([])
+    backend.replay_journal(records)
+    assert backend.profile_json() == expected
+    assert backend.coord_index == {(0, 0, 0): first}
+
+
+def test_journal_torn_record(store):
+    journal_append(backend.journal_file, {"op": "delete", "id": 1})
+    journal_append(backend.journal_file, {"op": "delete", "id": 2})
+    with open(backend.journal_file, "a") as fp:
+        fp.write('{"op": "delete", "i\n{"op": "delete", "id": 3}\n')   # Nothing after a torn record counts
+
+    header, records = journal_read(backend.journal_file)
+    assert [record["id"] for record in records] == [1, 2]
+
+
+def test_stale_journal_not_replayed(store):
+    with open(backend.file, "w") as fp:
+        json.dump([{"id": 0, "sound": "a.wav", "row": 0, "col": 0}], fp)
+    journal_reset(backend.journal_file, snapshot_hash(b"[]"))      # Written for an older profile.json
+    journal_append(backend.journal_file, {"op": "add", "entry": {"id": 1, "sound": "b.wav"}})
+
+    backend.back_init()
+    assert list(backend.profile) == [0]
+    header, records = journal_read(backend.journal_file)
+    with open(backend.file, "rb") as fp:
+        assert header == {"snapshot": snapshot_hash(fp.read())}
+    assert records == []
+
+
+def test_journal_compaction(store, monkeypatch):
+    monkeypatch.setattr(backend, "journal_limit", 1)
+    backend.add_sound("a.wav", "A", row=0, col=0)
+
+    with open(backend.file, "rb") as fp:
+        data = fp.read()
+    assert [raw["sound"] for raw in json.loads(data)] == ["a.wav"]
+    assert journal_read(backend.journal_file) == ({"snapshot": snapshot_hash(data)}, [])
+
+
+def test_slot_collision(store):
+    first, _ = backend.add_sound("a.wav", "A", row=0, col=0)
+    second, _ = backend.add_sound("b.wav", "B", row=0, col=1)
+    with pytest.raises(ValueError):
+        backend.add_sound("c.wav", "C", row=0, col=0)
+    with pytest.raises(ValueError):
+        backend.edit_sound(second, col=0)
+    assert backend.coord_index == {(0, 0, 0): first, (0, 0, 1): second}
+    assert backend.profile[second].col == 1
+
+
+def test_add_and_edit_validated(store):
+    with pytest.raises(ValueError):
+        backend.add_sound("a.wav", "A", start=3, end=2)
+    with pytest.raises(ValueError):
+        backend.add_sound("a.wav", "A", vol=150)
+    assert backend.profile == {}
+
+    sid, _ = backend.add_sound("a.wav", "A", row=0, col=0)
+    with pytest.raises(ValueError):
+        backend.edit_sound(sid, vol=150)
+    assert backend.profile[sid].volume == backend.default_vol / 100
+
+
+def saved_sounds():
+    with open(backend.file, "r") as fp:
+        return [raw["sound"] for raw in json.load(fp)]
+
+
+def test_writes_coalesce_off_the_scheduler(store, monkeypatch):
+    monkeypatch.setattr(backend, "storage_mode", "snapshot")
+    monkeypatch.setattr(backend, "write_delay", 0.05)
+    writers = []
+
+    def atomic_write(path, data):
+        writers.append(threading.current_thread().name)
+        persist.atomic_write(path, data)
+
+    monkeypatch.setattr(backend, "atomic_write", atomic_write)
+    before = write_stats()
+    for i in range(5):
+        backend.add_sound(f"{i}.wav", str(i))
+    deadline = time.perf_counter() + 2
+    while backend.flush_entry is not None and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    write_wait()
+
+    assert write_stats()["requests"] - before["requests"] == 5
+    assert writers == ["PiSound writer"]
+    assert saved_sounds() == [f"{i}.wav" for i in range(5)]
+
+
+def test_profile_batch_writes_once(store, monkeypatch):
+    monkeypatch.setattr(backend, "storage_mode", "snapshot")
+    monkeypatch.setattr(backend, "write_delay", 60)
+    before = write_stats()["writes"]
+    with backend.profile_batch():
+        with backend.profile_batch():
+            backend.add_sound("a.wav", "A")
+        backend.add_sound("b.wav", "B")
+        assert write_stats()["writes"] == before
+    assert write_stats()["writes"] == before + 1
+    assert saved_sounds() == ["a.wav", "b.wav"]
+    assert backend.flush_entry is None
+
+
+def test_no_write_delay_writes_every_change(store, monkeypatch):
+    monkeypatch.setattr(backend, "storage_mode", "snapshot")
+    monkeypatch.setattr(backend, "write_delay", 0)
+    before = write_stats()["writes"]
+    backend.add_sound("a.wav", "A")
+    backend.add_sound("b.wav", "B")
+    assert write_stats()["writes"] == before + 2
+
+
+def test_replay_skips_records_of_unknown_sounds(store):
+    snapshot = json.dumps([{"id": 0, "sound": "a.wav", "volume": 5}, {"id": 1, "sound": "b.wav"}])
+    with open(backend.file, "w") as fp:
+        fp.write(snapshot)
+    journal_reset(backend.journal_file, snapshot_hash(snapshot.encode()))
+    journal_append(backend.journal_file, {"op": "edit", "id": 0, "entry": {"id": 0, "sound": "a.wav"}})
+    journal_append(backend.journal_file, {"op": "delete", "id": 7})
+    journal_append(backend.journal_file, {"op": "add", "entry": {"id": 2, "sound": "c.wav", "volume": 2}})
+    journal_append(backend.journal_file, {"op": "edit", "id": 1, "entry": {"id": 1, "sound": "b2.wav"}})
+
+    backend.back_init()                         # The invalid entry 0 is set aside, not edited
+    assert [sel.sound for sel in backend.profile.values()] == ["b2.wav"]
+    assert backend.invalid_entries == [{"id": 0, "sound": "a.wav", "volume": 5}]
+
+
+def test_lazy_pages_load_on_first_use(store, monkeypatch):
+    monkeypatch.setattr(backend, "lazy_load", True)
+    entries = [{"id": 0, "sound": "a.wav", "row": 0, "col": 0, "page": 0},
+               {"id": 1, "sound": "b.wav", "row": 0, "col": 0, "page": 1, "img": "b.png"},
+               {"id": 2, "sound": "c.wav", "row": 1, "col": 0, "page": 1, "chain": [{"sound": "d.wav"}]}]
+    backend.set_profile([dict(raw) for raw in entries])
+    assert backend.profile == {}
+    assert json.loads(backend.profile_json()) == entries
+
+    assert backend.get_by_coord(0, 0, 1).sound == "b.wav"
+    assert list(backend.profile) == [1, 2] and list(backend.pending_pages) == [0]
+    assert backend.page_count() == 2
@@ -0,0 +1,69 @@
+import json
+import os
+import socket
+import wave
+import pytest
+import backend
+import daemon
+from daemon import daemon_start, handle_line, parse
+from engine import engine_init, engine_stop_all
+
+
+@pytest.fixture
+def profile(tmp_path, monkeypatch, mixer_on):
+    """A profile holding sound 0 (a 1 s WAV file) and sound 1 (a missing file)."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backend, "run_in_cmd", False)
+    monkeypatch.setattr(backend, "storage_mode", "snapshot")
+    os.mkdir("sounds")
+    with wave.open(os.path.join("sounds", "tone.wav"), "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(44100)
+        wf.writeframes(b"\x00\x10" * 2 * 44100)
+    backend.set_profile([{"id": 0, "sound": "tone.wav", "text": "Tone", "row": 0, "col": 0},
+                         {"id": 1, "sound": "gone.wav", "text": "Gone", "row": 0, "col": 1}])
+    engine_init()
+    daemon.voices.clear()
+    yield
+    engine_stop_all()
+    backend.flush_json()
+
+
+def test_parse():
+    assert parse("play 3 40\n") == {"cmd": "play", "id": 3, "volume": 40}
+    assert parse("STOP") == {"cmd": "stop"}
+    assert parse('{"cmd": "play", "id": 3, "tag": "a"}') == {"cmd": "play", "id": 3, "tag": "a"}
+    for line in ("", "  \n", "[1, 2]", "play three", "{not json"):
+        with pytest.raises(ValueError):
+            parse(line)
+
+
+def test_replies(profile):
+    assert handle_line('{"cmd": "ping", "tag": 7}') == {"ok": True, "tag": 7}
+    played = handle_line("play 0 40")
+    assert played["ok"] and played["id"] == 0
+    assert handle_line("volume 0 60") == {"ok": True, "id": 0, "volume": 60}
+    assert backend.profile[0].volume == 0.6
+    assert [raw["text"] for raw in handle_line("list")["sounds"]] == ["Tone", "Gone"]
+    assert handle_line("stop 0") == {"ok": True}
+
+
+@pytest.mark.parametrize("line", ["play 9", "play", "volume 0", "jump 0", "play x", "{bad", "play 1"])
+def test_error_replies(profile, line):
+    reply = handle_line(line)
+    assert reply["ok"] is False and reply["error"]
+
+
+def test_daemon_start_serves_socket(profile, tmp_path):
+    path = str(tmp_path / "pisound.sock")
+    daemon_start(path)
+    with socket.socket(socket.AF_UNIX) as client:
+        client.connect(path)
+        client.sendall(b"ping\n")
+        assert json.loads(client.makefile().readline()) == {"ok": True}
+
+
+def test_daemon_start_raises_when_it_cannot_listen(tmp_path):
+    with pytest.raises(OSError):
+        daemon_start(str(tmp_path / "missing" / "pisound.sock"))
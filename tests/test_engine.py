@@ -0,0 +1,86 @@
+import threading
+import time
+import pygame.mixer as mixer
+import pytest
+import engine
+import loudness
+from engine import engine_init, engine_play, engine_stop_all
+
+
+@pytest.fixture
+def pool(mixer_on, monkeypatch):
+    """A pool of 2 channels."""
+    monkeypatch.setattr(engine, "num_channels", engine.num_channels)
+    engine_init(2)
+    yield
+    engine_stop_all()
+
+
+def tone(seconds: float = 2.0):
+    return mixer.Sound(buffer=b"\x00\x10" * 2 * round(seconds * 44100))
+
+
+@pytest.mark.parametrize("policy, stolen", [("oldest", 0), ("quietest", 1)])
+def test_steal_policy(pool, policy, stolen):
+    first = engine_play(tone(), 0.8, policy=policy)
+    second = engine_play(tone(), 0.2, policy=policy)
+    third = engine_play(tone(), 0.5, policy=policy)
+    assert third.index == (first, second)[stolen].index
+    assert not (first, second)[stolen].is_alive()
+    assert (first, second)[1 - stolen].is_alive()
+
+
+def test_free_channel_before_stealing(pool):
+    first = engine_play(tone(), 0.5)
+    first.stop()
+    second = engine_play(tone(), 0.5)
+    third = engine_play(tone(), 0.5)
+    assert second.is_alive() and third.is_alive()
+    assert {second.index, third.index} == {0, 1}
+
+
+def test_retrigger_reuses_slot_channel(pool):
+    slot = object()
+    first = engine_play(tone(), 0.5, slot=slot, policy="retrigger")
+    engine_play(tone(), 0.5, policy="retrigger").stop()     # Leaves a free channel
+    again = engine_play(tone(), 0.5, slot=slot, policy="retrigger")
+    assert again.index == first.index
+    assert not first.is_alive() and again.is_alive()
+
+
+@pytest.mark.skipif(loudness.np is None, reason="levels need NumPy")
+def test_level_worked_out_in_background(pool, monkeypatch):
+    release = threading.Event()
+    job = loudness.envelope_job
+    monkeypatch.setattr(loudness, "envelope_job", lambda snd: release.wait(2) and job(snd))
+    voice = engine_play(tone(), 0.5)
+    assert voice.level() is None                # Not worked out on the caller's thread
+    release.set()
+
+    deadline = time.perf_counter() + 2
+    while voice.level() is None and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert voice.level() == pytest.approx(0.5 * 0x1000 / 0x8000, rel=0.01)
+
+
+def test_chain_plays_every_clip_then_finishes(pool):
+    ended = threading.Event()
+    clips = [tone(0.1), tone(0.1), tone(0.1)]
+    seen = []
+    voice = engine_play(clips[0], 0.5, chain=clips[1:], on_end=lambda v: ended.set())
+    while not ended.wait(0.01):
+        if not seen or seen[-1] is not voice.sound:
+            seen.append(voice.sound)
+    assert seen == clips
+    assert not voice.is_alive()
+
+
+def test_loop_starts_over_until_stopped(pool):
+    ended = threading.Event()
+    clips = [tone(0.1), tone(0.1)]
+    voice = engine_play(clips[0], 0.5, chain=clips[1:], loop=True, on_end=lambda v: ended.set())
+    assert not ended.wait(0.5)                  # Two and a half times through the loop
+    assert voice.is_alive()
+    assert voice.queued is clips[(voice.clip + 1) % 2]
+    voice.stop()
+    assert ended.is_set() and not voice.is_alive()
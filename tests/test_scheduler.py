@@ -0,0 +1,16 @@
+import threading
+import scheduler
+
+
+def test_order_and_cancel():
+    ran = []
+    done = threading.Event()
+    scheduler.schedule(0.03, lambda: ran.append(3))
+    scheduler.schedule(0.01, lambda: ran.append(1))
+    cancelled = scheduler.schedule(0.02, lambda: ran.append(2))
+    scheduler.schedule(0.02, lambda: 1 / 0)         # A failing callback does not stop the later ones
+    scheduler.schedule(0.04, done.set)
+    scheduler.cancel(cancelled)
+
+    assert done.wait(2)
+    assert ran == [1, 3]
@@ -0,0 +1,58 @@
+import pygame.mixer as mixer
+import pytest
+import soundbank
+from soundbank import bank_insert, bank_lookup, bank_pin, bank_set_budget, bank_stats, trim_sound
+
+
+@pytest.fixture
+def bank(mixer_on, monkeypatch):
+    """An empty sound bank with a budget of 3 s of sound (44.1 kHz 16 bit stereo)."""
+    monkeypatch.setattr(soundbank, "bank_budget", soundbank.bank_budget)
+    soundbank.bank_clear()
+    bank_pin([])
+    bank_set_budget(3 * 44100 * 4)
+    yield soundbank.bank
+    soundbank.bank_clear()
+    bank_pin([])
+
+
+def second(seconds: float = 1.0):
+    return mixer.Sound(buffer=bytes(round(seconds * 44100) * 4))
+
+
+def test_trim_sound_bounds(mixer_on):
+    snd = mixer.Sound(buffer=bytes(44100 * 4))      # 1 s of 16 bit stereo silence
+    assert trim_sound(snd, 0.25, 0.75).get_length() == pytest.approx(0.5)
+    assert trim_sound(snd, 0.5, 0).get_length() == pytest.approx(0.5)
+    assert trim_sound(snd, 0.5, 5).get_length() == pytest.approx(0.5)
+    for start, end in ((0.5, 0.5), (0.6, 0.4), (2, 0), (2, 3)):
+        with pytest.raises(ValueError):
+            trim_sound(snd, start, end)
+
+
+def test_bank_evicts_least_recently_played(bank):
+    for name in ("a", "b", "c"):
+        bank_insert(name, second())
+    assert bank_lookup("a") is not None         # Now b is the least recently played
+    bank_insert("d", second())
+    assert list(bank) == ["c", "a", "d"]
+    assert bank_stats()["bytes"] == 3 * 44100 * 4
+
+
+def test_bank_keeps_pinned_sounds(bank):
+    for name in ("a", "b", "c"):
+        bank_insert(name, second())
+    bank_pin(["a", "b"])
+    bank_insert("d", second())
+    assert list(bank) == ["a", "b", "d"]
+    bank_set_budget(44100 * 4)                  # Pinned sounds stay even past the budget
+    assert list(bank) == ["a", "b"]
+
+
+def test_bank_byte_accounting(bank):
+    bank_insert("a", second(0.5))
+    bank_insert("a", second(2))                 # Replacing a sound does not count it twice
+    bank_insert("b", second(0.25))
+    assert bank_stats()["bytes"] == round(2.25 * 44100) * 4
+    soundbank.bank_drop("a")
+    assert bank_stats()["bytes"] == round(0.25 * 44100) * 4
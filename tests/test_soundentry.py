@@ -0,0 +1,25 @@
+import pytest
+from soundentry import entry_from_dict
+
+
+@pytest.mark.parametrize("raw", [
+    {"text": "no sound"},
+    {"sound": ""},
+    {"sound": "a.wav", "volume": 1.5},
+    {"sound": "a.wav", "volume": "loud"},
+    {"sound": "a.wav", "start": -1},
+    {"sound": "a.wav", "start": 3, "end": 2},
+    {"sound": "a.wav", "start": 2, "end": 2},
+    {"sound": "a.wav", "chain": ["b.wav"]},
+    {"sound": "a.wav", "chain": [{"sound": "b.wav", "start": 2, "end": 1}]},
+])
+def test_entry_from_dict_rejects(raw):
+    with pytest.raises(ValueError):
+        entry_from_dict(raw)
+
+
+def test_entry_from_dict_accepts():
+    sel = entry_from_dict({"id": 4, "sound": "a.wav", "volume": 0.5, "start": 1, "end": 2,
+                           "chain": [{"sound": "b.wav"}], "loop": True})
+    assert (sel.id, sel.start, sel.end, sel.loop) == (4, 1.0, 2.0, True)
+    assert [clip.sound for clip in sel.chain] == ["b.wav"]